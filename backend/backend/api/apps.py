@@ -1,6 +1,63 @@
+import os
+import sys
+import time
+
 from django.apps import AppConfig
+from django.conf import settings
+
+# manage.py commands that serve requests or run jobs; every other command starts without the ML stack.
+SERVING_COMMANDS = ('runserver', 'run_job_workers')
+
+
+def _is_serving_process():
+    if os.path.basename(sys.argv[0]) in ('manage.py', 'django-admin'):
+        command = sys.argv[1] if len(sys.argv) > 1 else ''
+        if command == 'runserver' and '--noreload' not in sys.argv:
+            # The autoreloader's parent only watches files; its child serves.
+            return os.environ.get('RUN_MAIN') == 'true'
+        return command in SERVING_COMMANDS
+    # Loaded by a WSGI/ASGI server (gunicorn, uvicorn, daphne).
+    return True
+
+
+def _runs_own_workers():
+    # run_job_workers starts its own pool and retention timer.
+    return os.path.basename(sys.argv[0]) in ('manage.py', 'django-admin') and sys.argv[1:2] == ['run_job_workers']
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if not _is_serving_process():
+            return
+        if getattr(settings, 'MODEL_WARMUP', False):
+            self.warmup()
+        if (getattr(settings, 'JOB_WORKERS_START_ON_READY', False) and getattr(settings, 'JOB_WORKERS_IN_PROCESS', True)
+                and not _runs_own_workers()):
+            self.start_job_workers()
+
+    def start_job_workers(self):
+        """Start this process's job workers and retention timer, so jobs queued before a restart run too."""
+        from . import retention
+        from .jobs import get_worker_pool
+
+        get_worker_pool().start()
+        retention.start_timer()
+
+    def warmup(self):
+        """Import torch and preload every model before the first request arrives."""
+        from .instrumentation import record_stage
+
+        start = time.perf_counter()
+        import torch  # noqa: F401
+        import torchvision  # noqa: F401
+        from .pipeline import warmup_models
+
+        import_seconds = time.perf_counter() - start
+        record_stage('ml_import', import_seconds)
+        seconds = warmup_models()
+        models = ', '.join(f'{name} {value:.2f}s' for name, value in seconds.items()) or 'no models'
+        print(f"🔥 Imported the ML stack in {import_seconds:.2f}s; warmed up {models} "
+              f"({time.perf_counter() - start:.2f}s total)")
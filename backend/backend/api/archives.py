@@ -0,0 +1,37 @@
+"""
+Limits on uploaded ZIP archives. Kept free of the ML stack so the web
+process can check an upload without importing torch.
+"""
+from django.conf import settings
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+class ArchiveRejected(ValueError):
+    pass
+
+
+def max_member_bytes():
+    return getattr(settings, 'UPLOAD_MAX_MEMBER_BYTES', 64 * 2**20)
+
+
+def image_members(zip_ref):
+    """
+    Image entries of ``zip_ref``, read from its central directory. Raises
+    ``ArchiveRejected`` if there are more than UPLOAD_MAX_IMAGE_MEMBERS or
+    they expand to more than UPLOAD_MAX_UNCOMPRESSED_BYTES.
+    """
+    members = [
+        info for info in zip_ref.infolist()
+        if not info.is_dir()
+        and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        and not info.filename.startswith('__MACOSX/')
+    ]
+    max_members = getattr(settings, 'UPLOAD_MAX_IMAGE_MEMBERS', 100000)
+    max_total = getattr(settings, 'UPLOAD_MAX_UNCOMPRESSED_BYTES', 4 * 2**30)
+    if len(members) > max_members:
+        raise ArchiveRejected(f"Archive contains {len(members)} images (limit {max_members})")
+    total_size = sum(info.file_size for info in members)
+    if total_size > max_total:
+        raise ArchiveRejected(f"Archive expands to {total_size} bytes (limit {max_total})")
+    return members
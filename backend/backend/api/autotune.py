@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+import torch
+from django.conf import settings
+
+from .instrumentation import GAN_TUNED_BATCH_SIZE, GAN_TUNED_IMAGES_PER_SECOND
+
+CANDIDATE_BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+# Stop growing the batch once doubling it improves throughput by less than this.
+MIN_SPEEDUP = 1.05
+# Keep a margin under the ceiling for encoding buffers and measurement noise.
+HEADROOM = 0.8
+
+
+def current_rss():
+    """Resident set size of this process in bytes (Linux), or None if unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_usage():
+    """
+    Resident, proportional (shared pages split between the processes mapping
+    them) and anonymous (heap, never shared with other workers) memory of
+    this process in bytes (Linux), or None.
+    """
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss', 'Anonymous'):
+                    usage[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return {
+        'rss': usage.get('Rss', 0),
+        'pss': usage.get('Pss', 0),
+        'anonymous': usage.get('Anonymous', 0),
+    }
+
+
+def available_memory():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def memory_ceiling():
+    """Bytes a single generation batch may use: GAN_MEMORY_CEILING_MB, else half of available memory."""
+    ceiling_mb = getattr(settings, 'GAN_MEMORY_CEILING_MB', 0)
+    if ceiling_mb:
+        return int(ceiling_mb * 2**20)
+    available = available_memory()
+    return available // 2 if available else None
+
+
+class _PeakSampler:
+    """Polls RSS on a background thread to catch the peak of a CPU forward pass."""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = current_rss() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = current_rss() or 0
+            if rss > self.peak:
+                self.peak = rss
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def measure(gen, steps, batch_size, z_dim, device):
+    """Return (images per second, peak extra bytes) for one forward pass at ``batch_size``."""
+    noise = torch.randn(batch_size, z_dim, device=device)
+    with torch.no_grad():
+        if device == 'cuda':
+            torch.cuda.synchronize()
+            torch.cuda.reset_peak_memory_stats()
+            baseline = torch.cuda.memory_allocated()
+            start = time.perf_counter()
+            gen(noise, alpha=1, steps=steps)
+            torch.cuda.synchronize()
+            elapsed = time.perf_counter() - start
+            used = torch.cuda.max_memory_allocated() - baseline
+        else:
+            baseline = current_rss() or 0
+            with _PeakSampler() as sampler:
+                start = time.perf_counter()
+                img = gen(noise, alpha=1, steps=steps)
+                elapsed = time.perf_counter() - start
+                del img
+            used = max(sampler.peak - baseline, 0)
+    return batch_size / elapsed, used
+
+
+def _key_labels(key):
+    """Metric labels for a tuner key, normally ``(generator_path, steps)``."""
+    if isinstance(key, tuple) and len(key) == 2:
+        return {'generator': os.path.basename(str(key[0])), 'steps': key[1]}
+    return {'key': str(key)}
+
+
+class BatchSizeTuner:
+    """
+    Picks a generation batch size per (generator, steps) by timing forward
+    passes at doubling batch sizes. Growth stops when throughput stops
+    improving or the next size's projected memory would exceed the ceiling.
+    Results are cached for the life of the process.
+    """
+
+    def __init__(self):
+        self._chosen = {}
+        self._lock = threading.Lock()
+
+    def batch_size_for(self, key, gen, steps, z_dim, device):
+        with self._lock:
+            if key in self._chosen:
+                return self._chosen[key]['batch_size']
+
+            ceiling = memory_ceiling()
+            max_batch = getattr(settings, 'GAN_MAX_BATCH_SIZE', CANDIDATE_BATCH_SIZES[-1])
+            measure(gen, steps, 1, z_dim, device)  # warm up allocator and kernels
+
+            best_size, best_rate, trials = 1, 0.0, []
+            for size in CANDIDATE_BATCH_SIZES:
+                if size > max_batch:
+                    break
+                rate, used = measure(gen, steps, size, z_dim, device)
+                trials.append({'batch_size': size, 'images_per_sec': round(rate, 2), 'peak_bytes': used})
+                if ceiling and used > ceiling * HEADROOM:
+                    break
+                improved = rate > best_rate * MIN_SPEEDUP
+                if rate > best_rate:
+                    best_size, best_rate = size, rate
+                if not improved:
+                    break
+                # Memory grows roughly linearly with batch size; don't try a size we can't afford.
+                if ceiling and used * 2 > ceiling * HEADROOM:
+                    break
+
+            self._chosen[key] = {'batch_size': best_size, 'images_per_sec': round(best_rate, 2), 'trials': trials}
+            labels = _key_labels(key)
+            GAN_TUNED_BATCH_SIZE.set(best_size, **labels)
+            GAN_TUNED_IMAGES_PER_SECOND.set(round(best_rate, 2), **labels)
+            print(f"📏 Autotuned batch size {best_size} for {key} ({best_rate:.1f} img/s, ceiling {ceiling})")
+            return best_size
+
+    def stats(self):
+        with self._lock:
+            return {str(key): value for key, value in self._chosen.items()}
+
+
+_tuner = BatchSizeTuner()
+
+
+def get_batch_size_tuner():
+    return _tuner
@@ -0,0 +1,369 @@
+"""
+Offline microbenchmarks for the image decoding, classification, generation and archiving paths,
+and the memory each worker process spends on loaded models.
+
+Models are built with random weights in a scratch directory, so the real
+``.pth`` files are not needed. ``utils`` is imported inside each function:
+spawned memory workers import this module before setting up Django. Every benchmark returns a plain dict, and
+``run_all`` collects them into one JSON-serialisable report.
+"""
+import io
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+
+import numpy as np
+import torch
+import torch.nn as nn
+from django.test import override_settings
+from PIL import Image, ImageDraw
+from torchvision import models
+
+from .autotune import _PeakSampler, current_rss, memory_usage
+from .sinks import ZipSink
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+@contextmanager
+def _measured():
+    """Yield a dict that receives wall time and peak extra RSS of the block."""
+    result = {}
+    baseline = current_rss() or 0
+    with _PeakSampler(interval=0.005) as sampler:
+        start = time.perf_counter()
+        yield result
+        result['seconds'] = time.perf_counter() - start
+    result['peak_rss_delta_bytes'] = max(sampler.peak - baseline, 0)
+
+
+def synthetic_cell(rng, size=360):
+    """A blurry red disc or sickle on a pale background, saved as JPEG-like RGB."""
+    image = Image.new('RGB', (size, size), tuple(int(v) for v in rng.integers(200, 240, 3)))
+    draw = ImageDraw.Draw(image)
+    cx, cy = rng.integers(size // 3, 2 * size // 3, 2)
+    r = int(rng.integers(size // 6, size // 3))
+    color = tuple(int(v) for v in (rng.integers(150, 220), rng.integers(30, 80), rng.integers(30, 80)))
+    draw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=color)
+    if rng.random() < 0.5:
+        draw.ellipse([cx - r // 2, cy - r, cx + r, cy + r // 2], fill=image.getpixel((2, 2)))
+    noise = rng.normal(0, 6, (size, size, 3))
+    return Image.fromarray(np.clip(np.asarray(image, dtype=np.float32) + noise, 0, 255).astype(np.uint8))
+
+
+def make_dataset(directory, count, seed=0):
+    """Write ``count`` synthetic cell images (mixed PNG/JPEG) and a ZIP of them; return the ZIP path."""
+    rng = np.random.default_rng(seed)
+    images_dir = os.path.join(directory, 'cells')
+    os.makedirs(images_dir, exist_ok=True)
+    zip_path = os.path.join(directory, 'cells.zip')
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for i in range(count):
+            name = f'cell_{i}.jpg' if i % 2 else f'cell_{i}.png'
+            path = os.path.join(images_dir, name)
+            synthetic_cell(rng).save(path)
+            zf.write(path, name)
+    return zip_path
+
+
+def make_random_models(directory):
+    """Save a random-weight classifier and generator; return (classifier path, generator path)."""
+    from . import utils
+
+    torch.manual_seed(0)
+    classifier = models.resnet18(weights=None)
+    classifier.fc = nn.Linear(classifier.fc.in_features, 2)
+    classifier_path = os.path.join(directory, 'cell_classifier_best.pth')
+    torch.save(classifier.state_dict(), classifier_path)
+
+    generator = utils.Generator(utils.Z_DIM, utils.W_DIM, utils.IN_CHANNELS, utils.CHANNELS_IMG)
+    generator_path = os.path.join(directory, 'generator_bench.pth')
+    torch.save(generator.state_dict(), generator_path)
+    return classifier_path, generator_path
+
+
+@contextmanager
+def bench_environment(classifier_path, directory):
+    """
+    Point the classifier at the random weights, keep their memory-mappable
+    conversions in the scratch ``directory`` (also for spawned workers, which
+    read settings from the environment), and disable caches that would skip work.
+    """
+    from . import utils
+
+    previous = utils.CLASSIFIER_MODEL_PATH
+    previous_weights_dir = os.environ.get('MODEL_WEIGHTS_DIR')
+    weights_dir = os.path.join(directory, 'model_weights')
+    utils.CLASSIFIER_MODEL_PATH = classifier_path
+    os.environ['MODEL_WEIGHTS_DIR'] = weights_dir
+    try:
+        with override_settings(
+            IMAGE_PREDICTION_CACHE_ENABLED=False, RESULT_CACHE_ENABLED=False, MODEL_WEIGHTS_DIR=weights_dir,
+        ):
+            yield
+    finally:
+        utils.CLASSIFIER_MODEL_PATH = previous
+        if previous_weights_dir is None:
+            os.environ.pop('MODEL_WEIGHTS_DIR', None)
+        else:
+            os.environ['MODEL_WEIGHTS_DIR'] = previous_weights_dir
+
+
+def bench_classification(directory, zip_path, count, repeat=2):
+    from . import utils
+
+    utils.get_classifier_model()  # load outside the timed region
+    results = {}
+    for label, run in (
+        ('classify_images', lambda: utils.classify_images(os.path.join(directory, 'cells'))),
+        ('classify_zip', lambda: utils.classify_zip(zip_path)),
+    ):
+        best = None
+        for _ in range(repeat):
+            with _measured() as measured:
+                summary = run()
+            if best is None or measured['seconds'] < best['seconds']:
+                best = measured
+        results[label] = {
+            'images': summary['total_images'],
+            'seconds': round(best['seconds'], 4),
+            'images_per_sec': round(summary['total_images'] / best['seconds'], 2),
+            'peak_rss_delta_bytes': best['peak_rss_delta_bytes'],
+        }
+    return results
+
+
+def bench_decode(count, size=1536, repeat=3):
+    """
+    Per-image decode time of the reduced-size loader against the original
+    ``Image.open().convert('RGB')`` + ``TRANSFORM`` path, on large synthetic
+    JPEGs and PNGs, with the largest pixel difference between the two.
+    """
+    from . import utils
+
+    rng = np.random.default_rng(2)
+    payloads = {'jpeg': [], 'png': []}
+    for i in range(count):
+        buffer = io.BytesIO()
+        fmt = 'jpeg' if i % 4 else 'png'
+        synthetic_cell(rng, size=size).save(buffer, format=fmt.upper())
+        payloads[fmt].append(buffer.getvalue())
+
+    def transform_path(data):
+        return utils.TRANSFORM(Image.open(io.BytesIO(data)).convert('RGB'))
+
+    results = {'source_size': size}
+    for fmt, blobs in payloads.items():
+        row = {'images': len(blobs)}
+        for label, decode in (('transform', transform_path), ('fast_decode', utils.decode_image_tensor)):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for data in blobs:
+                    decode(data)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            row[label] = {
+                'ms_per_image': round(1000 * best / len(blobs), 3),
+                'images_per_sec': round(len(blobs) / best, 2),
+            }
+        row['speedup'] = round(row['transform']['ms_per_image'] / row['fast_decode']['ms_per_image'], 2)
+        row['max_abs_difference'] = round(max(
+            (transform_path(data) - utils.decode_image_tensor(data)).abs().max().item() for data in blobs
+        ), 4)
+        results[fmt] = row
+    return results
+
+
+def bench_generation(directory, generator_path, steps_list, num_images):
+    from . import utils
+
+    results = {}
+    for steps in steps_list:
+        utils.get_generator(generator_path, steps)
+        # First call autotunes the batch size; time the second.
+        utils.generate_images_with_gan(generator_path, os.path.join(directory, 'warmup'), num_images=1, steps=steps)
+        archive = os.path.join(directory, f'generated_{steps}.zip')
+        with _measured() as measured:
+            with ZipSink(archive) as sink:
+                utils.generate_images_with_gan(generator_path, sink, num_images=num_images, steps=steps)
+        results[str(steps)] = {
+            'resolution': 4 * 2 ** steps,
+            'images': num_images,
+            'seconds': round(measured['seconds'], 4),
+            'images_per_sec': round(num_images / measured['seconds'], 2),
+            'peak_rss_delta_bytes': measured['peak_rss_delta_bytes'],
+            'archive_bytes': os.path.getsize(archive),
+        }
+    return results
+
+
+def bench_archiving(directory, count, resolution=128):
+    """Stored streaming ZIP (ZipSink) against the old directory + make_archive path."""
+    rng = np.random.default_rng(1)
+    blobs = []
+    for _ in range(count):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (resolution, resolution, 3), dtype=np.uint8)).save(buffer, format='PNG')
+        blobs.append(buffer.getvalue())
+    total_bytes = sum(len(blob) for blob in blobs)
+
+    with _measured() as streamed:
+        with ZipSink(os.path.join(directory, 'streamed.zip')) as sink:
+            for i, blob in enumerate(blobs):
+                sink.write(f'generated_{i}.png', blob)
+
+    png_dir = os.path.join(directory, 'pngs')
+    os.makedirs(png_dir, exist_ok=True)
+    with _measured() as legacy:
+        for i, blob in enumerate(blobs):
+            with open(os.path.join(png_dir, f'generated_{i}.png'), 'wb') as f:
+                f.write(blob)
+        shutil.make_archive(os.path.join(directory, 'legacy'), 'zip', root_dir=png_dir)
+
+    def row(measured):
+        return {
+            'seconds': round(measured['seconds'], 4),
+            'images_per_sec': round(count / measured['seconds'], 2),
+            'mb_per_sec': round(total_bytes / 2**20 / measured['seconds'], 2),
+        }
+
+    return {'images': count, 'payload_bytes': total_bytes, 'zip_sink': row(streamed), 'make_archive': row(legacy)}
+
+
+def memory_worker(classifier_path, generator_path, steps_list, mmap, barrier, results):
+    """
+    Spawned process that loads the classifier and generators the way a web
+    worker does and reports its memory before and after, and again once every
+    worker is loaded (shared pages are only split between processes then).
+    """
+    import django
+
+    os.environ['MODEL_WARMUP'] = '0'
+    os.environ['JOB_WORKERS_IN_PROCESS'] = '0'
+    os.environ['MODEL_MMAP_WEIGHTS'] = '1' if mmap else '0'
+    django.setup()
+    from . import utils
+
+    utils.CLASSIFIER_MODEL_PATH = classifier_path
+    before = memory_usage()
+    utils.get_classifier_model()
+    for steps in steps_list:
+        utils.get_generator(generator_path, steps)
+    loaded = memory_usage()
+    barrier.wait()
+    results.put({'pid': os.getpid(), 'before': before, 'loaded': loaded, 'all_loaded': memory_usage()})
+    barrier.wait()
+
+
+def bench_model_memory(classifier_path, generator_path, steps_list, workers=2):
+    """
+    Memory of ``workers`` processes that each load the classifier and the
+    generators, with copied and with memory-mapped weights. Workers are
+    spawned so none inherits models from this process.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for label, mmap in (('copied', False), ('mmap', True)):
+        barrier = context.Barrier(workers)
+        queue = context.Queue()
+        processes = [
+            context.Process(target=memory_worker, args=(classifier_path, generator_path, steps_list, mmap, barrier, queue))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        reports = [queue.get(timeout=600) for _ in processes]
+        for process in processes:
+            process.join()
+
+        def mib(value):
+            return round(value / 2**20, 1)
+
+        rows = [
+            {
+                'rss_before_mib': mib(report['before']['rss']),
+                'rss_after_mib': mib(report['all_loaded']['rss']),
+                'pss_after_mib': mib(report['all_loaded']['pss']),
+                'anonymous_growth_mib': mib(report['all_loaded']['anonymous'] - report['before']['anonymous']),
+                'pss_growth_mib': mib(report['all_loaded']['pss'] - report['before']['pss']),
+            }
+            for report in reports
+        ]
+        results[label] = {
+            'workers': rows,
+            'total_pss_growth_mib': round(sum(row['pss_growth_mib'] for row in rows), 1),
+        }
+    return results
+
+
+def run_all(images=64, generate=32, steps_list=(4, 5, 6), archive_images=500, decode_images=32, sections=None,
+            memory_workers=2):
+    from . import utils
+
+    sections = set(sections or ('decode', 'classification', 'generation', 'archiving', 'memory'))
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'device': utils.DEVICE,
+        'results': {},
+    }
+    directory = tempfile.mkdtemp(prefix='bench-')
+    try:
+        classifier_path, generator_path = make_random_models(directory)
+        with bench_environment(classifier_path, directory):
+            if 'decode' in sections:
+                report['results']['decode'] = bench_decode(decode_images)
+            if 'classification' in sections:
+                zip_path = make_dataset(directory, images)
+                report['results']['classification'] = bench_classification(directory, zip_path, images)
+            if 'generation' in sections:
+                report['results']['generation'] = bench_generation(directory, generator_path, steps_list, generate)
+            if 'archiving' in sections:
+                report['results']['archiving'] = bench_archiving(directory, archive_images)
+            if 'memory' in sections and memory_workers:
+                report['results']['memory'] = bench_model_memory(
+                    classifier_path, generator_path, steps_list, memory_workers
+                )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    report['peak_rss_bytes'] = peak_rss_bytes()
+    return report
+
+
+def _throughputs(node, prefix=''):
+    """Flatten every ``images_per_sec`` / ``mb_per_sec`` value in a report into {path: value}."""
+    values = {}
+    if isinstance(node, dict):
+        for key, value in node.items():
+            path = f'{prefix}.{key}' if prefix else key
+            if key in ('images_per_sec', 'mb_per_sec') and isinstance(value, (int, float)):
+                values[path] = value
+            else:
+                values.update(_throughputs(value, path))
+    return values
+
+
+def compare(baseline, current, tolerance=0.1):
+    """List throughput metrics that dropped by more than ``tolerance`` (a fraction) against ``baseline``."""
+    old = _throughputs(baseline.get('results', {}))
+    new = _throughputs(current.get('results', {}))
+    regressions = []
+    for path, before in old.items():
+        after = new.get(path)
+        if after is not None and before > 0 and after < before * (1 - tolerance):
+            regressions.append({'metric': path, 'baseline': before, 'current': after, 'change': round(after / before - 1, 4)})
+    return regressions
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Process
+
+EVENT_FIELDS = ('state', 'progress', 'images_classified', 'images_generated', 'error', 'started_at', 'updated_at')
+FINAL_STATES = (Process.STATE_DONE, Process.STATE_FAILED)
+KEEPALIVE_SECONDS = 15
+
+
+def _eta_seconds(row):
+    """Remaining time extrapolated from overall progress since the job started."""
+    if row['state'] not in Process.RUNNING_STATES or not row['started_at'] or not row['progress']:
+        return None
+    elapsed = (timezone.now() - row['started_at']).total_seconds()
+    return round(elapsed * (100 - row['progress']) / row['progress'], 1)
+
+
+def _event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _process_events(pk, poll_interval):
+    """
+    Yield SSE messages for process ``pk``: a ``stage`` event when the state
+    changes, ``progress`` when only counts move, and a final ``done`` or ``failed``.
+    Jobs may run in another process, so changes are picked up by polling the
+    row with the async ORM; waiting between polls holds no thread.
+    """
+    last_state, last_updated, last_ping = None, None, time.monotonic()
+    while True:
+        row = await Process.objects.filter(pk=pk).values(*EVENT_FIELDS).afirst()
+        if row is None:
+            yield _event('failed', {'error': 'Process not found'})
+            return
+        if row['updated_at'] != last_updated:
+            payload = {
+                'id': pk,
+                'state': row['state'],
+                'progress': row['progress'],
+                'images_classified': row['images_classified'],
+                'images_generated': row['images_generated'],
+                'eta_seconds': _eta_seconds(row),
+            }
+            if row['state'] in FINAL_STATES:
+                yield _event(row['state'], {**payload, 'error': row['error']})
+                return
+            yield _event('stage' if row['state'] != last_state else 'progress', payload)
+            last_state, last_updated, last_ping = row['state'], row['updated_at'], time.monotonic()
+        elif time.monotonic() - last_ping >= KEEPALIVE_SECONDS:
+            yield ': keepalive\n\n'
+            last_ping = time.monotonic()
+        await asyncio.sleep(poll_interval)
+
+
+async def process_events(request, pk):
+    """
+    Server-sent events for one process. Served without a thread per client
+    when the app runs under ASGI (``backend.asgi:application``).
+    """
+    if not await Process.objects.filter(pk=pk).aexists():
+        raise Http404('Process not found')
+    poll_interval = getattr(settings, 'PROCESS_EVENTS_POLL_INTERVAL', 1.0)
+    response = StreamingHttpResponse(_process_events(pk, poll_interval), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+    return response
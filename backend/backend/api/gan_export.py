@@ -0,0 +1,194 @@
+from typing import List
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from .utils import Z_DIM, randn_batch
+from .weights import share_module_weights
+
+
+def _fold_linear(ws_linear):
+    """WSLinear computes linear(x * scale) + bias; fold the scale into the weight."""
+    weight = ws_linear.linear.weight.detach() * ws_linear.scale
+    linear = nn.Linear(weight.shape[1], weight.shape[0])
+    linear.weight.data.copy_(weight)
+    linear.bias.data.copy_(ws_linear.bias.detach())
+    return linear
+
+
+def _fold_conv(ws_conv):
+    """WSConv2d computes conv(x * scale) + bias; fold the scale into the kernel."""
+    conv = ws_conv.conv
+    folded = nn.Conv2d(conv.in_channels, conv.out_channels, conv.kernel_size, conv.stride, conv.padding)
+    folded.weight.data.copy_(conv.weight.detach() * ws_conv.scale)
+    folded.bias.data.copy_(ws_conv.bias.detach())
+    return folded
+
+
+def _copy_conv(conv):
+    copied = nn.Conv2d(conv.in_channels, conv.out_channels, conv.kernel_size, conv.stride, conv.padding)
+    copied.load_state_dict(conv.state_dict())
+    return copied
+
+
+def noise_shapes(batch_size, steps):
+    """Shapes of the per-layer noise ``Generator`` draws, in the order it draws them."""
+    shapes = [(batch_size, 1, 4, 4)] * 2
+    for step in range(steps):
+        res = 4 * 2 ** (step + 1)
+        shapes += [(batch_size, 1, res, res)] * 2
+    return shapes
+
+
+def make_noise(batch_size, steps, device, rng=None):
+    """Per-layer noise; ``rng`` may be one Generator or one per sample, as in ``Generator``."""
+    return [randn_batch(shape, rng, device=device) for shape in noise_shapes(batch_size, steps)]
+
+
+class _StyledLayer(nn.Module):
+    """[upsample] -> conv -> add noise -> leaky ReLU -> AdaIN, with style given as inputs."""
+
+    def __init__(self, conv, noise_weight, upsample):
+        super().__init__()
+        self.conv = conv
+        self.noise_weight = nn.Parameter(noise_weight.detach().clone())
+        self.upsample = upsample
+
+    def forward(self, x, noise, scale, bias):
+        if self.upsample:
+            x = F.interpolate(x, scale_factor=2.0, mode='bilinear', align_corners=False)
+        x = self.conv(x)
+        x = F.leaky_relu(x + self.noise_weight * noise, 0.2)
+        x = F.instance_norm(x)
+        return scale.unsqueeze(2).unsqueeze(3) * x + bias.unsqueeze(2).unsqueeze(3)
+
+
+class InferenceGenerator(nn.Module):
+    """
+    Inference-only form of ``Generator`` for a fixed ``steps``:
+
+    * equalized learning-rate scales are folded into plain Linear/Conv2d weights,
+    * the style scale/bias projections of every AdaIN are stacked into one
+      matrix, so a forward pass does a single matmul for all styles,
+    * progressive blocks and RGB layers beyond ``steps`` are dropped,
+    * per-layer noise is passed in rather than drawn inside the graph, which
+      keeps the module scriptable.
+
+    Noise drawn with ``make_noise`` from the same RNG state as ``Generator``
+    gives the same image.
+    """
+
+    def __init__(self, gen, steps):
+        super().__init__()
+        self.steps = steps
+        self.epsilon = gen.map.mapping[0].epsilon
+        mapping = [_fold_linear(layer) for layer in gen.map.mapping if hasattr(layer, 'scale')]
+        self.mapping = nn.ModuleList(mapping[:-1])
+        self.mapping_out = mapping[-1]
+        self.register_buffer('starting_constant', gen.starting_constant.detach().clone())
+
+        blocks = list(gen.prog_blocks[:steps])
+        adains = [gen.initial_adain1, gen.initial_adain2]
+        layers = [
+            _StyledLayer(nn.Identity(), gen.initial_noise1.weight, False),
+            _StyledLayer(_copy_conv(gen.initial_conv), gen.initial_noise2.weight, False),
+        ]
+        for block in blocks:
+            adains += [block.adain1, block.adain2]
+            layers += [
+                _StyledLayer(_fold_conv(block.conv1), block.inject_noise1.weight, True),
+                _StyledLayer(_fold_conv(block.conv2), block.inject_noise2.weight, False),
+            ]
+        self.layers = nn.ModuleList(layers)
+
+        # One projection for every AdaIN: rows are [scale_0, bias_0, scale_1, bias_1, ...]
+        weights, biases = [], []
+        for adain in adains:
+            for projection in (adain.style_scale, adain.style_bias):
+                folded = _fold_linear(projection)
+                weights.append(folded.weight.data)
+                biases.append(folded.bias.data)
+        self.style = nn.Linear(weights[0].shape[1], sum(w.shape[0] for w in weights))
+        self.style.weight.data.copy_(torch.cat(weights))
+        self.style.bias.data.copy_(torch.cat(biases))
+        self.style_splits: List[int] = [w.shape[0] for w in weights]
+
+        self.to_rgb = _fold_conv(gen.rgb_layers[steps] if steps > 0 else gen.initial_rgb)
+        self.eval()
+
+    def forward(self, z, noises: List[torch.Tensor]):
+        w = z / torch.sqrt(torch.mean(z ** 2, dim=1, keepdim=True) + self.epsilon)
+        for layer in self.mapping:
+            w = F.relu(layer(w))
+        w = self.mapping_out(w)
+
+        styles = torch.split(self.style(w), self.style_splits, dim=1)
+
+        x = self.starting_constant.expand(z.shape[0], -1, -1, -1)
+        for i, layer in enumerate(self.layers):
+            x = layer(x, noises[i], styles[2 * i], styles[2 * i + 1])
+        return self.to_rgb(x)
+
+
+class ExportedGenerator(nn.Module):
+    """Drop-in for ``Generator`` in ``generate_images_with_gan``: same call signature, fixed steps."""
+
+    def __init__(self, net, steps, mode):
+        super().__init__()
+        self.net = net
+        self.steps = steps
+        self.mode = mode
+
+    def forward(self, noise, alpha=1, steps=None, rng=None):
+        if steps is not None and steps != self.steps:
+            raise ValueError(f"Exported for steps={self.steps}, called with steps={steps}")
+        return self.net(noise, make_noise(noise.shape[0], self.steps, noise.device, rng))
+
+
+def _compile(net, mode):
+    if mode == 'jit':
+        return torch.jit.script(net)
+    if mode == 'compile':
+        return torch.compile(net, dynamic=True)
+    return net
+
+
+def max_abs_difference(reference, exported, steps, batch_size=2, seed=0):
+    """Run both generators from the same RNG state and return the largest pixel difference."""
+    device = next(reference.parameters()).device
+    with torch.no_grad():
+        rng = torch.Generator(device=device).manual_seed(seed)
+        z = torch.randn(batch_size, Z_DIM, device=device, generator=rng)
+        expected = reference(z, alpha=1, steps=steps, rng=rng)
+
+        rng = torch.Generator(device=device).manual_seed(seed)
+        z = torch.randn(batch_size, Z_DIM, device=device, generator=rng)
+        actual = exported(z, steps=steps, rng=rng)
+    return (expected - actual).abs().max().item()
+
+
+def export_generator(gen, steps, mode='eager', verify=True, tolerance=1e-3, weights_path=None):
+    """
+    Build an ``ExportedGenerator`` for ``steps`` from a loaded ``Generator``.
+    ``mode`` is ``'eager'``, ``'jit'`` (TorchScript) or ``'compile'``
+    (``torch.compile``). With ``verify`` the export is checked against the
+    original module and ``gen`` itself is returned if it does not match or
+    compilation fails. Given the checkpoint ``weights_path`` the folded
+    weights are memory-mapped so worker processes share them.
+    """
+    net = InferenceGenerator(gen, steps).to(next(gen.parameters()).device)
+    if weights_path is not None:
+        share_module_weights(net, weights_path, f'steps{steps}')
+    try:
+        exported = ExportedGenerator(_compile(net, mode), steps, mode)
+        if verify:
+            diff = max_abs_difference(gen, exported, steps)
+            if diff > tolerance:
+                print(f"⚠️ Exported generator differs by {diff:.2e} (> {tolerance}); using the original module")
+                return gen
+            print(f"🧮 Exported generator for steps={steps} ({mode}), max diff {diff:.2e}")
+    except Exception as e:
+        print(f"⚠️ Generator export failed ({mode}): {e}; using the original module")
+        return gen
+    return exported
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import torch
+from django.conf import settings
+
+from .instrumentation import CLASSIFIER_BATCH_FILL, CLASSIFIER_QUEUE_DEPTH, CLASSIFIER_QUEUE_WAIT_SECONDS, timed
+
+
+class _Request:
+    __slots__ = ('model', 'tensors', 'future', 'submitted')
+
+    def __init__(self, model, tensors):
+        self.model = model
+        self.tensors = tensors
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class InferenceServer:
+    """
+    Runs classifier forward passes for every job in this process, one at a
+    time. Jobs submit stacked image tensors and get a Future for their logits;
+    a scheduler thread joins queued requests for the same model into batches
+    of up to ``max_batch_size`` images.
+
+    While other jobs are classifying (see ``client``) the scheduler waits up to
+    ``max_wait_ms`` for their requests before running a partial batch, so a
+    job that is alone is never delayed.
+    """
+
+    def __init__(self, max_batch_size=None, max_wait_ms=None):
+        self.max_batch_size = max_batch_size or getattr(settings, 'CLASSIFIER_SERVER_MAX_BATCH_SIZE', 64)
+        if max_wait_ms is None:
+            max_wait_ms = getattr(settings, 'CLASSIFIER_SERVER_MAX_WAIT_MS', 10)
+        self.max_wait = max_wait_ms / 1000
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._clients = 0
+        self._thread = None
+
+    @contextmanager
+    def client(self):
+        """Register a job that will submit requests one at a time until the block exits."""
+        with self._condition:
+            self._clients += 1
+        try:
+            yield self
+        finally:
+            with self._condition:
+                self._clients -= 1
+                self._condition.notify()
+
+    def submit(self, model, tensors):
+        """Queue a stacked batch of images for ``model``; the Future resolves to their logits."""
+        request = _Request(model, tensors)
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='classifier-server', daemon=True)
+                self._thread.start()
+            self._pending.append(request)
+            CLASSIFIER_QUEUE_DEPTH.inc(len(tensors))
+            self._condition.notify()
+        return request.future
+
+    def _take_batch(self):
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                model = self._pending[0].model
+                queued = sum(len(r.tensors) for r in self._pending if r.model is model)
+                # Each client has at most one request queued; once all have one, no more are coming.
+                if queued >= self.max_batch_size or len(self._pending) >= self._clients:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch, size = [], 0
+            for request in list(self._pending):
+                if request.model is not model:
+                    continue
+                if batch and size + len(request.tensors) > self.max_batch_size:
+                    break
+                batch.append(request)
+                size += len(request.tensors)
+            for request in batch:
+                self._pending.remove(request)
+            CLASSIFIER_QUEUE_DEPTH.dec(size)
+            return model, batch, size
+
+    def _run(self):
+        while True:
+            model, batch, size = self._take_batch()
+            started = time.perf_counter()
+            for request in batch:
+                CLASSIFIER_QUEUE_WAIT_SECONDS.observe(started - request.submitted)
+            CLASSIFIER_BATCH_FILL.observe(size / self.max_batch_size)
+            try:
+                with torch.no_grad(), timed('classify_server_forward'):
+                    stacked = batch[0].tensors if len(batch) == 1 else torch.cat([r.tensors for r in batch])
+                    logits = model(stacked)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            offset = 0
+            for request in batch:
+                request.future.set_result(logits[offset:offset + len(request.tensors)])
+                offset += len(request.tensors)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_inference_server():
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                _server = InferenceServer()
+    return _server
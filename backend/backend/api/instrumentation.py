@@ -0,0 +1,204 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{escaped}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(labels)} {value}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {series["count"]}')
+                lines.append(f'{self.name}_sum{_format_labels(labels)} {series["sum"]}')
+                lines.append(f'{self.name}_count{_format_labels(labels)} {series["count"]}')
+        return lines
+
+
+JOBS = Counter('sicklecell_jobs_total', 'Processing jobs by final state.')
+IMAGES_CLASSIFIED = Counter('sicklecell_images_classified_total', 'Images classified, by source (model or cache).')
+IMAGES_GENERATED = Counter('sicklecell_images_generated_total', 'Images generated, by GAN.')
+STAGE_SECONDS = Histogram('sicklecell_stage_seconds', 'Time spent in each processing stage.')
+MODEL_LOAD_SECONDS = Histogram('sicklecell_model_load_seconds', 'Time to load a model into the registry.')
+MODEL_REGISTRY_LOOKUPS = Counter(
+    'sicklecell_model_registry_lookups_total', 'Model registry lookups by model and result (hit or miss).',
+)
+MODEL_REGISTRY_RELOADS = Counter(
+    'sicklecell_model_registry_reloads_total', 'Models reloaded because their weights file changed.',
+)
+MODEL_REGISTRY_EVICTIONS = Counter(
+    'sicklecell_model_registry_evictions_total', 'Models evicted to stay within the registry memory budget.',
+)
+MODEL_REGISTRY_RESIDENT_BYTES = Gauge(
+    'sicklecell_model_registry_resident_bytes', 'Approximate size of the models resident in the registry.',
+)
+MODEL_REGISTRY_RESIDENT_MODELS = Gauge('sicklecell_model_registry_resident_models', 'Models resident in the registry.')
+GAN_TUNED_BATCH_SIZE = Gauge('sicklecell_gan_tuned_batch_size', 'Autotuned generation batch size per generator and steps.')
+GAN_TUNED_IMAGES_PER_SECOND = Gauge(
+    'sicklecell_gan_tuned_images_per_second', 'Generation throughput measured at the autotuned batch size.',
+)
+CLASSIFIER_QUEUE_DEPTH = Gauge('sicklecell_classifier_queue_images', 'Images waiting for the shared classifier.')
+CLASSIFIER_QUEUE_WAIT_SECONDS = Histogram(
+    'sicklecell_classifier_queue_wait_seconds', 'Time a classification request waited before its batch ran.',
+)
+CLASSIFIER_BATCH_FILL = Histogram(
+    'sicklecell_classifier_batch_fill_ratio', 'Images in each shared classifier batch as a share of the maximum.',
+    buckets=(0.125, 0.25, 0.375, 0.5, 0.625, 0.75, 0.875, 1),
+)
+
+METRICS = [
+    JOBS, IMAGES_CLASSIFIED, IMAGES_GENERATED, STAGE_SECONDS, MODEL_LOAD_SECONDS,
+    MODEL_REGISTRY_LOOKUPS, MODEL_REGISTRY_RELOADS, MODEL_REGISTRY_EVICTIONS,
+    MODEL_REGISTRY_RESIDENT_BYTES, MODEL_REGISTRY_RESIDENT_MODELS, GAN_TUNED_BATCH_SIZE, GAN_TUNED_IMAGES_PER_SECOND,
+    CLASSIFIER_QUEUE_DEPTH, CLASSIFIER_QUEUE_WAIT_SECONDS, CLASSIFIER_BATCH_FILL,
+]
+
+
+def render_metrics():
+    """All metrics of this process in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class StageTimings:
+    """
+    Per-job totals of time spent in each stage. Stages that run on worker
+    threads (decoding, PNG encoding) add up across threads, so their totals
+    can exceed the job's wall time.
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def add(self, stage, seconds, count=1):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {'seconds': 0.0, 'count': 0})
+            entry['seconds'] += seconds
+            entry['count'] += count
+
+    def as_dict(self):
+        with self._lock:
+            stages = {name: {'seconds': round(v['seconds'], 4), 'count': v['count']} for name, v in self._stages.items()}
+        return {'wall_seconds': round(time.perf_counter() - self._started, 4), 'stages': stages}
+
+
+_current_timings = contextvars.ContextVar('stage_timings', default=None)
+
+
+@contextmanager
+def collect_timings():
+    """Collect stage timings recorded by code running in this context (and threads started from it)."""
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def current_timings():
+    return _current_timings.get()
+
+
+def record_stage(stage, seconds, timings=None, count=1):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = timings or _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds, count)
+
+
+@contextmanager
+def timed(stage, timings=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, timings)
@@ -0,0 +1,180 @@
+import os
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from . import retention
+from .instrumentation import JOBS, collect_timings
+from .models import Process
+from .pipeline import ProcessingError, run_process
+
+
+def _torch_threads(concurrency):
+    # Split the cores between concurrent jobs so they don't oversubscribe the CPU.
+    return getattr(settings, 'JOB_TORCH_THREADS', None) or max(1, (os.cpu_count() or 1) // concurrency)
+
+
+def _configure_torch_threads(concurrency):
+    # Deferred to the first job so starting the pool doesn't import torch.
+    import torch
+
+    torch.set_num_threads(_torch_threads(concurrency))
+
+
+def requeue_stale_jobs():
+    """Put jobs whose worker stopped reporting progress back on the queue."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 1800))
+    return Process.objects.filter(state__in=Process.RUNNING_STATES, updated_at__lt=cutoff).update(
+        state=Process.STATE_QUEUED, progress=0, updated_at=timezone.now()
+    )
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to classifying and return its id."""
+    requeue_stale_jobs()
+    candidates = (
+        Process.objects.filter(state=Process.STATE_QUEUED)
+        .order_by('queued_at', 'id')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        now = timezone.now()
+        claimed = Process.objects.filter(pk=pk, state=Process.STATE_QUEUED).update(
+            state=Process.STATE_CLASSIFYING, started_at=now, updated_at=now
+        )
+        if claimed:
+            return pk
+    return None
+
+
+def execute_job(pk):
+    process = Process.objects.get(pk=pk)
+    print(f"⚙️ Running job for process {pk}")
+    with collect_timings() as timings:
+        try:
+            run_process(process)
+        except ProcessingError as e:
+            _mark_failed(pk, str(e), timings)
+        except Exception as e:
+            traceback.print_exc()
+            print(f"Error in job for process {pk}: {e}")
+            _mark_failed(pk, str(e), timings)
+        else:
+            JOBS.inc(state=Process.STATE_DONE)
+            print(f"🏁 Process {pk} done")
+
+
+def _mark_failed(pk, message, timings=None):
+    JOBS.inc(state=Process.STATE_FAILED)
+    now = timezone.now()
+    Process.objects.filter(pk=pk).update(
+        state=Process.STATE_FAILED,
+        error=message,
+        timings=timings.as_dict() if timings is not None else None,
+        finished_at=now,
+        updated_at=now,
+    )
+
+
+def enqueue(process):
+    """Queue ``process`` for processing and wake the in-process workers."""
+    now = timezone.now()
+    process.state = Process.STATE_QUEUED
+    process.progress = 0
+    process.images_classified = 0
+    process.images_generated = 0
+    process.error = None
+    process.cancel_requested = False
+    process.preview_file = None
+    process.timings = None
+    # A re-run writes a new output and preview; only an expired upload stays expired.
+    expired = {kind: at for kind, at in (process.expired_artifacts or {}).items() if kind == 'upload'}
+    process.expired_artifacts = expired or None
+    process.queued_at = now
+    process.started_at = None
+    process.finished_at = None
+    process.save(update_fields=[
+        'state', 'progress', 'images_classified', 'images_generated', 'error', 'cancel_requested',
+        'preview_file', 'timings', 'expired_artifacts', 'queued_at', 'started_at', 'finished_at', 'updated_at',
+    ])
+
+    if getattr(settings, 'JOB_WORKERS_IN_PROCESS', True):
+        get_worker_pool().start()
+        get_worker_pool().notify()
+        retention.start_timer()
+
+
+class JobWorkerPool:
+    """
+    Fixed number of threads that pull queued ``Process`` rows from the database
+    and run them. Several pools (web processes or ``run_job_workers``) can
+    share one database; claiming a job is a conditional UPDATE so each job
+    runs once.
+    """
+
+    def __init__(self, concurrency=None, poll_interval=None):
+        self.concurrency = concurrency or getattr(settings, 'JOB_WORKER_CONCURRENCY', 1)
+        self.poll_interval = poll_interval or getattr(settings, 'JOB_POLL_INTERVAL', 2.0)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            # Threads don't survive fork: a forked server worker starts its own even if its parent had some.
+            if self._threads and self._pid == os.getpid():
+                return
+            self._threads = []
+            self._pid = os.getpid()
+            threads = _torch_threads(self.concurrency)
+            for i in range(self.concurrency):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            print(f"👷 Started {self.concurrency} job worker(s), {threads} torch thread(s) each")
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                close_old_connections()
+                pk = claim_next_job()
+                if pk is not None:
+                    _configure_torch_threads(self.concurrency)
+                    execute_job(pk)
+                    continue
+            except Exception as e:
+                print(f"Error in job worker: {e}")
+            finally:
+                connections.close_all()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = JobWorkerPool()
+    return _pool
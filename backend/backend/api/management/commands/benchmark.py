@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Run offline decoding, classification, generation, archiving and model memory benchmarks and print a JSON report.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=64, help='Synthetic images to classify.')
+        parser.add_argument('--decode-images', type=int, default=32, help='Large synthetic images to decode.')
+        parser.add_argument('--generate', type=int, default=32, help='Images to generate per steps value.')
+        parser.add_argument('--steps', type=int, nargs='+', default=[4, 5, 6], help='Generator steps to benchmark.')
+        parser.add_argument('--archive-images', type=int, default=500, help='Images to write in the archive benchmark.')
+        parser.add_argument(
+            '--memory-workers', type=int, default=2,
+            help='Worker processes loading the models in the memory section (0 skips it).',
+        )
+        parser.add_argument(
+            '--only', nargs='+', choices=['decode', 'classification', 'generation', 'archiving', 'memory'],
+            help='Run only these sections.',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--compare', help='Baseline JSON report; exit non-zero if throughput regressed.')
+        parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed throughput drop for --compare.')
+
+    def handle(self, *args, **options):
+        report = benchmarks.run_all(
+            images=options['images'],
+            generate=options['generate'],
+            steps_list=options['steps'],
+            archive_images=options['archive_images'],
+            decode_images=options['decode_images'],
+            sections=options['only'],
+            memory_workers=options['memory_workers'],
+        )
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            report['regressions'] = benchmarks.compare(baseline, report, options['tolerance'])
+
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(text)
+
+        if report.get('regressions'):
+            raise CommandError(f"{len(report['regressions'])} benchmark regression(s) against {options['compare']}")
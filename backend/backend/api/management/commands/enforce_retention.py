@@ -0,0 +1,20 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.retention import enforce_retention
+
+
+class Command(BaseCommand):
+    help = 'Delete uploads, outputs, previews and temporary files past their TTL or over the media disk quota.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-bytes', type=int, default=None,
+            help='Total size MEDIA_ROOT may use (defaults to RETENTION_MAX_MEDIA_BYTES; 0 for no quota).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be removed without deleting it.')
+
+    def handle(self, *args, **options):
+        report = enforce_retention(max_bytes=options['max_bytes'], dry_run=options['dry_run'])
+        self.stdout.write(json.dumps(report, indent=2))
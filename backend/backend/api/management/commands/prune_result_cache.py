@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.result_cache import evict
+
+
+class Command(BaseCommand):
+    help = 'Evict result cache entries by age and total archive size.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None, help='Maximum idle age in seconds.')
+        parser.add_argument('--max-bytes', type=int, default=None, help='Maximum total size of cached archives.')
+
+    def handle(self, *args, **options):
+        removed = evict(max_age=options['max_age'], max_bytes=options['max_bytes'])
+        self.stdout.write(f'Removed {removed} cache entries.')
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import retention
+from api.jobs import JobWorkerPool
+
+
+class Command(BaseCommand):
+    help = 'Run background workers that process queued jobs from the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=None,
+            help='Number of jobs to run at once (defaults to JOB_WORKER_CONCURRENCY).',
+        )
+
+    def handle(self, *args, **options):
+        pool = JobWorkerPool(concurrency=options['concurrency'] or settings.JOB_WORKER_CONCURRENCY)
+        pool.start()
+        retention.start_timer()
+        self.stdout.write(f'Waiting for jobs with {pool.concurrency} worker(s); press Ctrl+C to stop.')
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop()
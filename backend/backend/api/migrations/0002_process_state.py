@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:05
+
+from django.db import migrations, models
+
+
+def mark_finished_processes_done(apps, schema_editor):
+    Process = apps.get_model('api', 'Process')
+    Process.objects.exclude(processed_file='').exclude(processed_file__isnull=True).update(state='done', progress=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='progress',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='state',
+            field=models.CharField(choices=[('created', 'Created'), ('queued', 'Queued'), ('classifying', 'Classifying'), ('generating', 'Generating'), ('archiving', 'Archiving'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='created', max_length=20),
+        ),
+        migrations.RunPython(mark_finished_processes_done, migrations.RunPython.noop),
+    ]
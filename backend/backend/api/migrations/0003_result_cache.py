@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_process_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('multiplier', models.IntegerField()),
+                ('weights_version', models.CharField(max_length=64)),
+                ('seed', models.IntegerField(blank=True, null=True)),
+                ('classification_summary', models.JSONField()),
+                ('gan_used', models.CharField(max_length=50)),
+                ('archive', models.CharField(max_length=255)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='seed',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagePrediction',
+            fields=[
+                ('image_hash', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('weights_version', models.CharField(db_index=True, max_length=16)),
+                ('predicted_class', models.PositiveSmallIntegerField()),
+                ('logits', models.JSONField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_image_prediction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
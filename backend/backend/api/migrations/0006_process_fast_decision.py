@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_process_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='fast_decision',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='images_classified',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='images_generated',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_process_image_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='cancel_requested',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='process',
+            name='preview_file',
+            field=models.FileField(blank=True, null=True, upload_to='previews/'),
+        ),
+    ]
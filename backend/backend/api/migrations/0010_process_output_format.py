@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_process_preview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='output_format',
+            field=models.CharField(choices=[('zip', 'PNG images in a ZIP archive'), ('tar', 'PNG images in an uncompressed tar'), ('webp', 'Lossless WebP images in a ZIP archive'), ('npy', 'One NumPy uint8 array (N, H, W, 3)')], default='zip', max_length=10),
+        ),
+    ]
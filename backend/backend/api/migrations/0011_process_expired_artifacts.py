@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_process_output_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='process',
+            name='expired_artifacts',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
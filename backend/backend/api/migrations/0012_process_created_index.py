@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_process_expired_artifacts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['-created_at', '-id'], name='process_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,211 @@
+import ctypes
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .instrumentation import (
+    MODEL_LOAD_SECONDS,
+    MODEL_REGISTRY_EVICTIONS,
+    MODEL_REGISTRY_LOOKUPS,
+    MODEL_REGISTRY_RELOADS,
+    MODEL_REGISTRY_RESIDENT_BYTES,
+    MODEL_REGISTRY_RESIDENT_MODELS,
+    record_stage,
+)
+
+
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def weights_fingerprint(*paths, extra=()):
+    """
+    Short digest of the size and mtime of weight files; changes whenever a file
+    is replaced. ``extra`` strings (e.g. a precision mode) are mixed in too.
+    """
+    digest = hashlib.sha256()
+    for item in extra:
+        digest.update(f'{item};'.encode())
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f'{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+        except OSError:
+            digest.update(f'{os.path.basename(path)}:missing;'.encode())
+    return digest.hexdigest()[:16]
+
+
+def _release_freed_memory():
+    """
+    Hand heap memory freed during a load (initial weights, conversion
+    buffers) back to the OS (glibc only); otherwise every worker keeps it
+    resident even when the model's own weights are shared.
+    """
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _model_label(key):
+    return key[0] if isinstance(key, tuple) else str(key)
+
+
+def _model_nbytes(model):
+    """Approximate resident size of a module from its state dict (covers quantized packed weights)."""
+    total = 0
+    seen = set()
+    for tensor in model.state_dict().values():
+        if not hasattr(tensor, 'element_size') or tensor.data_ptr() in seen:
+            continue
+        seen.add(tensor.data_ptr())
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _Entry:
+    __slots__ = ('model', 'path', 'mtime', 'nbytes', 'load_seconds')
+
+    def __init__(self, model, path, mtime, nbytes, load_seconds):
+        self.model = model
+        self.path = path
+        self.mtime = mtime
+        self.nbytes = nbytes
+        self.load_seconds = load_seconds
+
+
+class ModelRegistry:
+    """
+    Keeps loaded models resident for the lifetime of the worker process.
+
+    Entries are keyed by an arbitrary hashable (e.g. ``('generator', path, steps)``)
+    and remember the mtime of the weights file they were built from, so replacing
+    a ``.pth`` file on disk triggers a reload on the next lookup. When the summed
+    size of resident models exceeds ``memory_budget_bytes`` the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, memory_budget_bytes=None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = OrderedDict()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'reloads': 0,
+            'evictions': 0,
+            'loads': 0,
+            'load_seconds': 0.0,
+        }
+
+    def get(self, key, path, loader):
+        """Return the model for ``key``, calling ``loader()`` if it is missing or stale."""
+        mtime = _file_mtime(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime == mtime:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                MODEL_REGISTRY_LOOKUPS.inc(model=_model_label(key), result='hit')
+                return entry.model
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread builds a given model; others wait and then hit the cache.
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.mtime == mtime:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    MODEL_REGISTRY_LOOKUPS.inc(model=_model_label(key), result='hit')
+                    return entry.model
+                stale = entry is not None
+                self._counters['misses'] += 1
+            MODEL_REGISTRY_LOOKUPS.inc(model=_model_label(key), result='miss')
+
+            start = time.perf_counter()
+            model = loader()
+            _release_freed_memory()
+            elapsed = time.perf_counter() - start
+            nbytes = _model_nbytes(model)
+            MODEL_LOAD_SECONDS.observe(elapsed, model=_model_label(key))
+            record_stage('model_load', elapsed)
+
+            with self._lock:
+                if stale:
+                    self._counters['reloads'] += 1
+                    MODEL_REGISTRY_RELOADS.inc(model=_model_label(key))
+                self._counters['loads'] += 1
+                self._counters['load_seconds'] += elapsed
+                self._entries[key] = _Entry(model, path, mtime, nbytes, elapsed)
+                self._entries.move_to_end(key)
+                self._evict_locked(keep=key)
+                self._publish_locked()
+
+            print(f"📦 Loaded {key} in {elapsed:.2f}s ({nbytes / 2**20:.1f} MiB)")
+            return model
+
+    def _evict_locked(self, keep):
+        if not self.memory_budget_bytes:
+            return
+        while self.resident_bytes() > self.memory_budget_bytes:
+            victim = next((k for k in self._entries if k != keep), None)
+            if victim is None:
+                break
+            del self._entries[victim]
+            self._counters['evictions'] += 1
+            MODEL_REGISTRY_EVICTIONS.inc(model=_model_label(victim))
+            print(f"🗑️ Evicted {victim} from model registry")
+
+    def _publish_locked(self):
+        MODEL_REGISTRY_RESIDENT_BYTES.set(self.resident_bytes())
+        MODEL_REGISTRY_RESIDENT_MODELS.set(len(self._entries))
+
+    def resident_bytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._publish_locked()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                'resident_models': [
+                    {
+                        'key': [str(part) for part in key] if isinstance(key, tuple) else str(key),
+                        'bytes': entry.nbytes,
+                        'load_seconds': round(entry.load_seconds, 4),
+                    }
+                    for key, entry in self._entries.items()
+                ],
+                'resident_bytes': self.resident_bytes(),
+                'memory_budget_bytes': self.memory_budget_bytes,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                budget_mb = getattr(settings, 'MODEL_REGISTRY_MEMORY_BUDGET_MB', 0)
+                _registry = ModelRegistry(int(budget_mb * 2**20) if budget_mb else None)
+    return _registry
@@ -1,11 +1,55 @@
+import uuid
+
 from django.db import models
 
 class Process(models.Model):
+    STATE_CREATED = 'created'
+    STATE_QUEUED = 'queued'
+    STATE_CLASSIFYING = 'classifying'
+    STATE_GENERATING = 'generating'
+    STATE_ARCHIVING = 'archiving'
+    STATE_DONE = 'done'
+    STATE_FAILED = 'failed'
+    OUTPUT_FORMAT_CHOICES = [
+        ('zip', 'PNG images in a ZIP archive'),
+        ('tar', 'PNG images in an uncompressed tar'),
+        ('webp', 'Lossless WebP images in a ZIP archive'),
+        ('npy', 'One NumPy uint8 array (N, H, W, 3)'),
+    ]
+    STATE_CHOICES = [
+        (STATE_CREATED, 'Created'),
+        (STATE_QUEUED, 'Queued'),
+        (STATE_CLASSIFYING, 'Classifying'),
+        (STATE_GENERATING, 'Generating'),
+        (STATE_ARCHIVING, 'Archiving'),
+        (STATE_DONE, 'Done'),
+        (STATE_FAILED, 'Failed'),
+    ]
+    RUNNING_STATES = (STATE_CLASSIFYING, STATE_GENERATING, STATE_ARCHIVING)
+    ACTIVE_STATES = (STATE_QUEUED,) + RUNNING_STATES
+
     original_file = models.FileField(upload_to='uploads/%Y/%m/%d/')
     multiplier = models.IntegerField()
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    seed = models.IntegerField(null=True, blank=True)
+    fast_decision = models.BooleanField(default=False)
+    output_format = models.CharField(max_length=10, choices=OUTPUT_FORMAT_CHOICES, default='zip')
     processed_file = models.FileField(upload_to='generated_zips/%Y/%m/%d/', null=True, blank=True)
+    preview_file = models.FileField(upload_to='previews/', null=True, blank=True)
     classification_summary = models.JSONField(null=True, blank=True)
     gan_used = models.CharField(max_length=50, null=True, blank=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_CREATED, db_index=True)
+    progress = models.FloatField(default=0)
+    images_classified = models.IntegerField(default=0)
+    images_generated = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    timings = models.JSONField(null=True, blank=True)
+    # Artifact kind ('upload', 'output', 'preview') -> when retention deleted it.
+    expired_artifacts = models.JSONField(null=True, blank=True)
+    queued_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -13,4 +57,54 @@ class Process(models.Model):
         return f"Process {self.id} - {self.original_file.name}"
 
     class Meta:
-        app_label = 'api' 
\ No newline at end of file
+        app_label = 'api'
+        indexes = [
+            # Keyset pagination of the process list, newest first.
+            models.Index(fields=['-created_at', '-id'], name='process_created_id_idx'),
+        ]
+
+
+class ResultCacheEntry(models.Model):
+    """Finished results for one (upload content, multiplier, model weights, seed) combination."""
+    key = models.CharField(max_length=64, unique=True)
+    content_hash = models.CharField(max_length=64)
+    multiplier = models.IntegerField()
+    weights_version = models.CharField(max_length=64)
+    seed = models.IntegerField(null=True, blank=True)
+    classification_summary = models.JSONField()
+    gan_used = models.CharField(max_length=50)
+    archive = models.CharField(max_length=255)
+    size_bytes = models.BigIntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"ResultCacheEntry {self.key[:12]} - {self.archive}"
+
+    class Meta:
+        app_label = 'api'
+
+
+class ImagePrediction(models.Model):
+    """Classifier output for one image, keyed by a digest of the image file's bytes."""
+    image_hash = models.CharField(max_length=32, primary_key=True)
+    weights_version = models.CharField(max_length=16, db_index=True)
+    predicted_class = models.PositiveSmallIntegerField()
+    logits = models.JSONField()
+
+    class Meta:
+        app_label = 'api'
+
+
+class UploadSession(models.Model):
+    """A chunked upload in progress; chunks are appended in order to ``UPLOAD_SESSION_DIR/<id>.part``."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField(null=True, blank=True)
+    received_bytes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        app_label = 'api'
@@ -0,0 +1,307 @@
+import contextvars
+import os
+import threading
+import time
+import zipfile
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import result_cache
+from .archives import ArchiveRejected
+from .instrumentation import IMAGES_GENERATED, current_timings, record_stage, timed
+from .models import Process
+from .sharding import generate_sharded, should_shard
+from .sinks import OUTPUT_FORMATS, open_sink
+from .uploads import hash_file
+
+# Share of the overall progress bar given to each stage.
+STAGE_PROGRESS = {
+    Process.STATE_CLASSIFYING: (0, 20),
+    Process.STATE_GENERATING: (20, 95),
+    Process.STATE_ARCHIVING: (95, 100),
+}
+PROGRESS_WRITE_INTERVAL = 1.0
+# Generator weights file, steps and output resolution used for each classification outcome.
+GENERATORS = {
+    # steps=6 for the positive GAN gives perfect circular shapes
+    'positive': ('generator_positive_256.pth', 6, '256x256'),
+    'negative': ('generator_negative_128.pth', 5, '128x128'),
+}
+# Process field that counts the items finished in each stage.
+STAGE_COUNT_FIELDS = {
+    Process.STATE_CLASSIFYING: 'images_classified',
+    Process.STATE_GENERATING: 'images_generated',
+}
+
+
+class ProcessingError(Exception):
+    """A job failed because of its input rather than a server fault."""
+
+
+class JobCancelled(ProcessingError):
+    """The user asked for the job to stop."""
+
+
+class _StageReporter:
+    """
+    Writes the job's state and throttled progress updates to its Process row,
+    and records how long the job spent in each state. Raises ``JobCancelled``
+    from a progress update once cancellation has been requested.
+    """
+
+    def __init__(self, process):
+        self.process = process
+        self.state = None
+        self._last_write = 0.0
+        self._entered = None
+        self._done = None
+
+    def enter(self, state):
+        self.close()
+        fields = {'state': state, 'progress': STAGE_PROGRESS[state][0]}
+        # Throttling may have skipped the previous stage's final count.
+        if self._done is not None and self.state in STAGE_COUNT_FIELDS:
+            fields[STAGE_COUNT_FIELDS[self.state]] = self._done
+        self.state = state
+        self._done = None
+        self._entered = time.perf_counter()
+        self._write(**fields)
+
+    def close(self):
+        if self._entered is not None:
+            record_stage(self.state, time.perf_counter() - self._entered)
+            self._entered = None
+
+    def __call__(self, done, total):
+        self._done = done
+        now = time.monotonic()
+        if not total or now - self._last_write < PROGRESS_WRITE_INTERVAL:
+            return
+        low, high = STAGE_PROGRESS[self.state]
+        fields = {'progress': round(low + (high - low) * min(done / total, 1), 2)}
+        if self.state in STAGE_COUNT_FIELDS:
+            fields[STAGE_COUNT_FIELDS[self.state]] = done
+        self._write(**fields)
+        if Process.objects.filter(pk=self.process.pk, cancel_requested=True).exists():
+            raise JobCancelled('Cancelled by user')
+
+    def _write(self, **fields):
+        self._last_write = time.monotonic()
+        for name, value in fields.items():
+            setattr(self.process, name, value)
+        Process.objects.filter(pk=self.process.pk).update(updated_at=timezone.now(), **fields)
+
+
+def _preview_saver(process):
+    """Callback that stores a first-batch contact sheet as the process's preview."""
+    def save(data):
+        name = f'previews/process_{process.pk}.png'
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        process.preview_file = name
+        Process.objects.filter(pk=process.pk).update(preview_file=name, updated_at=timezone.now())
+    return save
+
+
+def select_generator(classification_result):
+    if classification_result['positive_count'] >= classification_result['negative_count']:
+        gan_type = 'positive'
+    else:
+        gan_type = 'negative'
+    filename, steps, resolution = GENERATORS[gan_type]
+    return gan_type, os.path.join(settings.BASE_DIR, 'models', filename), steps, resolution
+
+
+def warmup_models():
+    """
+    Load the classifier and every generator into the registry and run one
+    forward pass through each, so the first job doesn't pay for it. Returns
+    the seconds spent on each model; models that fail to load are skipped.
+    """
+    import torch
+
+    from .utils import CLASSIFIER_MODEL_PATH, DEVICE, Z_DIM, get_classifier_model, get_generator
+
+    def classify():
+        get_classifier_model()(torch.zeros(1, 3, 224, 224, device=DEVICE))
+
+    def generate(path, steps):
+        get_generator(path, steps)(torch.randn(1, Z_DIM, device=DEVICE), alpha=1, steps=steps)
+
+    models = [('classifier', CLASSIFIER_MODEL_PATH, classify)]
+    for gan_type, (filename, steps, _) in GENERATORS.items():
+        path = os.path.join(settings.BASE_DIR, 'models', filename)
+        models.append((gan_type, path, lambda path=path, steps=steps: generate(path, steps)))
+
+    seconds = {}
+    with torch.no_grad():
+        for name, path, forward in models:
+            if not os.path.exists(path):
+                print(f"⚠️ Skipping warmup of {name}: {path} not found")
+                continue
+            start = time.perf_counter()
+            try:
+                forward()
+            except Exception as e:
+                print(f"⚠️ Warmup of {name} failed: {e}")
+                continue
+            seconds[name] = round(time.perf_counter() - start, 3)
+            record_stage('warmup', seconds[name])
+    return seconds
+
+
+def _classify_remaining(zip_path, names, sampled, result, stop):
+    """
+    Count the images a fast decision skipped and store the exact summary in
+    ``result``, unless ``stop`` is set first (the job failed or was cancelled).
+    """
+    from .utils import classify_zip, merge_classifications
+
+    try:
+        rest = classify_zip(zip_path, names=names, should_stop=lambda counts, errors: stop.is_set())
+        if stop.is_set():
+            print("🛑 Background classification stopped")
+            return
+        summary = merge_classifications(sampled, rest)
+        summary['sampled_decision'] = sampled['final_classification']
+        summary['sampled_images'] = sampled['total_images']
+        result['summary'] = summary
+        print(f"🧮 Background classification finished: {summary['final_classification']}")
+    except Exception as e:
+        print(f"⚠️ Background classification failed, keeping the sampled summary: {e}")
+    finally:
+        connections.close_all()
+
+
+def run_process(process):
+    """Classify the upload, generate images with the matching GAN and archive them."""
+    # The ML stack is imported on the first job, not when the web app or a management command loads.
+    from .utils import classify_zip, classify_zip_sampled, generate_images_with_gan, get_generator
+
+    reporter = _StageReporter(process)
+    zip_path = os.path.join(settings.MEDIA_ROOT, process.original_file.name)
+
+    # Identical upload, multiplier, weights and seed: reuse the earlier result
+    if not process.content_hash:
+        with timed('hash_upload'):
+            process.content_hash = hash_file(zip_path)
+        Process.objects.filter(pk=process.pk).update(content_hash=process.content_hash)
+    version = result_cache.weights_version()
+    cache_key = result_cache.cache_key(
+        process.content_hash, process.multiplier, version, process.seed, process.output_format
+    )
+    with timed('result_cache_lookup'):
+        cached = result_cache.lookup(cache_key)
+    if cached is not None:
+        print(f"♻️ Reusing cached result {cached.archive} for process {process.pk}")
+        process.classification_summary = cached.classification_summary
+        process.gan_used = cached.gan_used
+        process.processed_file = cached.archive
+        _finish(process)
+        return
+
+    # Classify images straight from the archive
+    reporter.enter(Process.STATE_CLASSIFYING)
+    remaining = []
+    try:
+        if process.fast_decision:
+            classification_result, remaining = classify_zip_sampled(
+                zip_path, seed=process.seed, progress_callback=reporter
+            )
+        else:
+            classification_result = classify_zip(zip_path, progress_callback=reporter)
+    except (ArchiveRejected, zipfile.BadZipFile) as e:
+        raise ProcessingError(str(e)) from e
+
+    # Check if images were found
+    if classification_result['total_images'] == 0:
+        print(f"No valid images found in {zip_path}")
+        raise ProcessingError('No valid images found')
+    total = classification_result.get('estimated_total_images', classification_result['total_images'])
+
+    process.classification_summary = classification_result
+    Process.objects.filter(pk=process.pk).update(classification_summary=classification_result, updated_at=timezone.now())
+
+    # A sampled decision lets generation start now; the rest is counted alongside it.
+    background, background_result, background_stop = None, {}, threading.Event()
+    if remaining and getattr(settings, 'CLASSIFY_EARLY_EXIT_COMPLETE', 'background') == 'background':
+        background = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(_classify_remaining, zip_path, remaining, classification_result, background_result, background_stop),
+            name=f'classify-rest-{process.pk}',
+            daemon=True,
+        )
+        background.start()
+
+    # Don't leave the background count running if generation fails or the job is cancelled.
+    try:
+        gan_type, generator_path, steps, resolution = select_generator(classification_result)
+
+        # Generate images straight into the output archive
+        reporter.enter(Process.STATE_GENERATING)
+        output_format = process.output_format
+        extension = OUTPUT_FORMATS[output_format][0]
+        # WebP images also go in a .zip; keep their name distinct from the PNG archive's.
+        suffix = '_webp' if output_format == 'webp' else ''
+        generated_path = os.path.join(
+            settings.MEDIA_ROOT, 'generated_zips', f'{gan_type}_generated_{process.pk}{suffix}{extension}'
+        )
+
+        # Calculate number of images to generate based on multiplier
+        num_images = total * process.multiplier
+
+        print(f"🚀 Starting generation with {gan_type} GAN...")
+        print(f"📊 Generating {num_images} images (original: {total} × multiplier: {process.multiplier})")
+        print(f"🎯 Using steps={steps} for {resolution} resolution")
+
+        with open_sink(generated_path, output_format) as sink:
+            if should_shard(num_images):
+                # Shard workers are separate processes; only the overall time is recorded here.
+                with timed('generate_sharded'):
+                    precision = generate_sharded(
+                        generator_path, sink, num_images, steps, seed=process.seed,
+                        progress_callback=reporter, preview_callback=_preview_saver(process), output_format=output_format,
+                    )
+            else:
+                generate_images_with_gan(
+                    generator_path, sink, num_images=num_images, steps=steps, progress_callback=reporter,
+                    seed=process.seed, preview_callback=_preview_saver(process),
+                )
+                precision = getattr(get_generator(generator_path, steps), 'precision', 'fp32')
+            reporter.enter(Process.STATE_ARCHIVING)
+        reporter.close()
+        IMAGES_GENERATED.inc(num_images, gan=gan_type)
+    except BaseException:
+        background_stop.set()
+        raise
+    finally:
+        if background is not None:
+            with timed('classify_remaining_wait'):
+                background.join()
+    if background is not None:
+        process.classification_summary = background_result.get('summary', classification_result)
+
+    print(f"✅ Created {output_format} output: {generated_path} ({os.path.getsize(generated_path)} bytes, {sink.count} images)")
+
+    # Update process
+    process.gan_used = f"{gan_type} (steps={steps}, {resolution}, {precision})"
+    process.processed_file = generated_path.replace(settings.MEDIA_ROOT + '/', '')
+    _finish(process)
+    # Sampled runs may size or pick the generator differently from a full count; don't reuse them.
+    if not process.fast_decision:
+        result_cache.store(cache_key, process, version)
+
+
+def _finish(process):
+    timings = current_timings()
+    if timings is not None:
+        process.timings = timings.as_dict()
+    process.state = Process.STATE_DONE
+    process.progress = 100
+    process.finished_at = timezone.now()
+    process.save()
@@ -0,0 +1,160 @@
+import copy
+import os
+import warnings
+
+import torch
+import torch.nn as nn
+from django.conf import settings
+
+from .archives import IMAGE_EXTENSIONS
+
+PRECISIONS = ('fp32', 'bf16', 'int8')
+CALIBRATION_SAMPLES = 32
+MIN_HELD_OUT_SAMPLES = 8
+
+
+def bf16_supported():
+    """True when the CPU has native bf16 support (AVX512-BF16 / AMX), where autocast pays off."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+class AutocastModule(nn.Module):
+    """Runs the wrapped model under bf16 autocast and hands back fp32 outputs."""
+
+    def __init__(self, model, device):
+        super().__init__()
+        self.model = model
+        self.device_type = 'cuda' if str(device).startswith('cuda') else 'cpu'
+
+    def forward(self, *args, **kwargs):
+        with torch.autocast(device_type=self.device_type, dtype=torch.bfloat16):
+            output = self.model(*args, **kwargs)
+        return output.float()
+
+
+def calibration_batch(decode, device):
+    """
+    Up to 2 * CALIBRATION_SAMPLES images from PRECISION_CALIBRATION_DIR,
+    decoded from their bytes by ``decode`` (the classifier's own loader) and
+    split alternately into a calibration set and a held-out set that the
+    agreement check runs on. None when there are too few images to check a
+    mode against fp32.
+    """
+    directory = getattr(settings, 'PRECISION_CALIBRATION_DIR', None)
+    tensors = []
+    if directory and os.path.isdir(directory):
+        for root, _, files in sorted(os.walk(directory)):
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS) and len(tensors) < 2 * CALIBRATION_SAMPLES:
+                    try:
+                        with open(os.path.join(root, filename), 'rb') as f:
+                            tensors.append(decode(f.read()))
+                    except Exception as e:
+                        print(f"Skipping calibration image {filename}: {e}")
+    if len(tensors) < 2 * MIN_HELD_OUT_SAMPLES:
+        return None
+    sample = torch.stack(tensors).to(device)
+    return sample[0::2], sample[1::2]
+
+
+def quantize_classifier(model, sample):
+    """
+    Post-training int8 quantization. Convolutions only have static int8
+    kernels in PyTorch, so the model is quantized in FX graph mode and
+    calibrated on ``sample``; if that is unavailable, Linear layers are
+    quantized dynamically instead.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        try:
+            from torch.ao.quantization import get_default_qconfig_mapping
+            from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+            prepared = prepare_fx(copy.deepcopy(model), get_default_qconfig_mapping('x86'), example_inputs=(sample[:1],))
+            with torch.no_grad():
+                prepared(sample)
+            return convert_fx(prepared)
+        except Exception as e:
+            print(f"⚠️ Static int8 quantization unavailable ({e}); quantizing Linear layers dynamically")
+            return torch.ao.quantization.quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+
+
+def _mark(model, precision):
+    model.precision = precision
+    return model
+
+
+def apply_classifier_precision(model, mode, decode, device):
+    """
+    Return ``model`` converted to ``mode`` if its predictions agree with fp32
+    on held-out calibration images at least PRECISION_MIN_AGREEMENT of the
+    time, otherwise the fp32 model. Without enough calibration images the
+    mode can't be checked and fp32 is used. The result carries a ``precision``
+    attribute.
+    """
+    if mode == 'fp32':
+        return _mark(model, 'fp32')
+    if mode == 'int8' and str(device) != 'cpu':
+        print("⚠️ int8 classifier needs the CPU backend; using fp32")
+        return _mark(model, 'fp32')
+    if mode == 'bf16' and str(device) == 'cpu' and not bf16_supported():
+        print("⚠️ CPU lacks native bf16 support; using fp32")
+        return _mark(model, 'fp32')
+
+    batch = calibration_batch(decode, device)
+    if batch is None:
+        print(f"⚠️ {mode} classifier needs at least {2 * MIN_HELD_OUT_SAMPLES} images in PRECISION_CALIBRATION_DIR; using fp32")
+        return _mark(model, 'fp32')
+    sample, held_out = batch
+    candidate = quantize_classifier(model, sample) if mode == 'int8' else AutocastModule(model, device)
+    with torch.no_grad():
+        expected = torch.argmax(model(held_out), dim=1)
+        actual = torch.argmax(candidate(held_out), dim=1)
+    agreement = (expected == actual).float().mean().item()
+    threshold = getattr(settings, 'PRECISION_MIN_AGREEMENT', 0.98)
+    if agreement < threshold:
+        print(f"⚠️ {mode} classifier agrees with fp32 on {agreement:.1%} of samples (< {threshold:.0%}); using fp32")
+        return _mark(model, 'fp32')
+    print(f"🎚️ Classifier running in {mode} ({agreement:.1%} agreement with fp32)")
+    return _mark(candidate, mode)
+
+
+def generator_pixel_error(reference, candidate, steps, z_dim, device, batch_size=4, seed=0):
+    """Largest of the mean absolute pixel error and per-channel mean/std drift between two generators."""
+    outputs = []
+    with torch.no_grad():
+        for model in (reference, candidate):
+            rng = torch.Generator(device=device).manual_seed(seed)
+            z = torch.randn(batch_size, z_dim, device=device, generator=rng)
+            outputs.append(model(z, alpha=1, steps=steps, rng=rng).float())
+    expected, actual = outputs
+    dims = (0, 2, 3)
+    return max(
+        (expected - actual).abs().mean().item(),
+        (expected.mean(dims) - actual.mean(dims)).abs().max().item(),
+        (expected.std(dims) - actual.std(dims)).abs().max().item(),
+    )
+
+
+def apply_generator_precision(gen, mode, steps, z_dim, device):
+    """bf16 autocast for a generator, kept only if its pixel statistics stay within PRECISION_MAX_PIXEL_ERROR."""
+    if mode == 'fp32':
+        return _mark(gen, 'fp32')
+    if mode != 'bf16':
+        print(f"⚠️ {mode} is not supported for generators; using fp32")
+        return _mark(gen, 'fp32')
+    if str(device) == 'cpu' and not bf16_supported():
+        print("⚠️ CPU lacks native bf16 support; using fp32")
+        return _mark(gen, 'fp32')
+
+    candidate = AutocastModule(gen, device)
+    error = generator_pixel_error(gen, candidate, steps, z_dim, device)
+    limit = getattr(settings, 'PRECISION_MAX_PIXEL_ERROR', 0.02)
+    if error > limit:
+        print(f"⚠️ bf16 generator pixel error {error:.4f} (> {limit}); using fp32")
+        return _mark(gen, 'fp32')
+    print(f"🎚️ Generator steps={steps} running in bf16 (pixel error {error:.4f})")
+    return _mark(candidate, 'bf16')
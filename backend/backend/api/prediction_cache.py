@@ -0,0 +1,76 @@
+import hashlib
+
+from .model_registry import weights_fingerprint
+from .models import ImagePrediction
+
+LOOKUP_CHUNK_SIZE = 256
+
+_current_version = None
+
+
+class CachedPrediction:
+    __slots__ = ('predicted_class',)
+
+    def __init__(self, predicted_class):
+        self.predicted_class = predicted_class
+
+
+def image_digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    """
+    Persistent per-image classifier results. Rows are tagged with the
+    fingerprint of the classifier weights, inference precision and image
+    decoder; when any of them changes, rows from older versions are dropped the
+    first time the cache is used.
+    """
+
+    def __init__(self, model_path, precision='fp32', decoder='transform'):
+        global _current_version
+        self.version = weights_fingerprint(model_path, extra=(precision, decoder))
+        if _current_version != self.version:
+            stale = ImagePrediction.objects.exclude(weights_version=self.version).delete()[0]
+            if stale:
+                print(f"🗑️ Dropped {stale} cached predictions from older classifier weights")
+            _current_version = self.version
+
+    def annotate(self, sources):
+        """
+        Turn ``(name, bytes)`` sources into ``(name, item)`` where ``item`` is a
+        ``CachedPrediction`` for known images or ``(digest, bytes)`` otherwise.
+        Lookups are done in chunks so each query covers many images.
+        """
+        chunk = []
+        for name, payload in sources:
+            chunk.append((name, payload))
+            if len(chunk) >= LOOKUP_CHUNK_SIZE:
+                yield from self._resolve(chunk)
+                chunk = []
+        yield from self._resolve(chunk)
+
+    def _resolve(self, chunk):
+        digests = [image_digest(payload) if isinstance(payload, bytes) else None for _, payload in chunk]
+        known = dict(
+            ImagePrediction.objects.filter(weights_version=self.version, image_hash__in=[d for d in digests if d])
+            .values_list('image_hash', 'predicted_class')
+        )
+        for (name, payload), digest in zip(chunk, digests):
+            if digest in known:
+                yield name, CachedPrediction(known[digest])
+            else:
+                yield name, (digest, payload)
+
+    def store(self, digests, logits, predictions):
+        rows = [
+            ImagePrediction(
+                image_hash=digest,
+                weights_version=self.version,
+                predicted_class=pred,
+                logits=[round(value, 5) for value in row],
+            )
+            for digest, row, pred in zip(digests, logits, predictions)
+            if digest is not None
+        ]
+        ImagePrediction.objects.bulk_create(rows, ignore_conflicts=True)
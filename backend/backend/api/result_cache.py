@@ -0,0 +1,117 @@
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .model_registry import weights_fingerprint
+from .models import Process, ResultCacheEntry
+
+MODEL_FILES = ('cell_classifier_best.pth', 'generator_positive_256.pth', 'generator_negative_128.pth')
+
+
+def weights_version():
+    """Fingerprint of the model files, inference precisions, image decoder and noise chunking that decide a job's output."""
+    return weights_fingerprint(
+        *(os.path.join(settings.BASE_DIR, 'models', name) for name in MODEL_FILES),
+        extra=(
+            f"classifier={getattr(settings, 'CLASSIFIER_PRECISION', 'fp32')}",
+            f"gan={getattr(settings, 'GAN_PRECISION', 'fp32')}",
+            f"decode={'fast' if getattr(settings, 'CLASSIFIER_FAST_DECODE', True) else 'transform'}",
+            # Seeded noise is drawn per image index in chunks of this size.
+            f"seeded_batch={getattr(settings, 'GAN_SEEDED_BATCH_SIZE', 16)}",
+        ),
+    )
+
+
+def cache_key(content_hash, multiplier, version, seed, output_format='zip'):
+    # The default format leaves keys unchanged from before formats were selectable.
+    suffix = '' if output_format == 'zip' else f'|{output_format}'
+    return hashlib.sha256(f'{content_hash}|{multiplier}|{version}|{seed}{suffix}'.encode()).hexdigest()
+
+
+def _archive_path(entry):
+    return os.path.join(settings.MEDIA_ROOT, entry.archive)
+
+
+def lookup(key):
+    """Return the live cache entry for ``key``, dropping it if its archive has gone."""
+    if not getattr(settings, 'RESULT_CACHE_ENABLED', True):
+        return None
+    entry = ResultCacheEntry.objects.filter(key=key).first()
+    if entry is None:
+        return None
+    if not os.path.exists(_archive_path(entry)):
+        entry.delete()
+        return None
+    ResultCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return entry
+
+
+def store(key, process, version):
+    if not getattr(settings, 'RESULT_CACHE_ENABLED', True):
+        return None
+    archive = process.processed_file.name
+    try:
+        size = os.path.getsize(os.path.join(settings.MEDIA_ROOT, archive))
+    except OSError:
+        return None
+    try:
+        entry = ResultCacheEntry.objects.create(
+            key=key,
+            content_hash=process.content_hash,
+            multiplier=process.multiplier,
+            weights_version=version,
+            seed=process.seed,
+            classification_summary=process.classification_summary,
+            gan_used=process.gan_used,
+            archive=archive,
+            size_bytes=size,
+        )
+    except IntegrityError:
+        # Another job with the same inputs finished first.
+        return None
+    evict()
+    return entry
+
+
+def evict(max_age=None, max_bytes=None):
+    """
+    Delete entries unused for longer than ``max_age`` seconds, then the least
+    recently used ones until the cached archives fit in ``max_bytes``. An
+    archive is only deleted with its entry once no process points at it;
+    otherwise it stays a process output until retention expires it. Returns
+    the number of entries removed.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'RESULT_CACHE_MAX_AGE_SECONDS', 7 * 24 * 3600)
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'RESULT_CACHE_MAX_BYTES', 10 * 1024 ** 3)
+
+    victims = []
+    if max_age:
+        cutoff = timezone.now() - timedelta(seconds=max_age)
+        victims.extend(ResultCacheEntry.objects.filter(last_used_at__lt=cutoff))
+
+    if max_bytes:
+        victim_ids = {entry.pk for entry in victims}
+        remaining = ResultCacheEntry.objects.exclude(pk__in=victim_ids).order_by('-last_used_at')
+        total = 0
+        for entry in remaining.only('pk', 'archive', 'size_bytes', 'last_used_at'):
+            total += entry.size_bytes
+            if total > max_bytes:
+                victims.append(entry)
+
+    for entry in victims:
+        entry.delete()
+        if not Process.objects.filter(processed_file=entry.archive).exists():
+            try:
+                os.remove(_archive_path(entry))
+            except FileNotFoundError:
+                pass
+    if victims:
+        print(f"🗑️ Evicted {len(victims)} result cache entr{'y' if len(victims) == 1 else 'ies'}")
+    return len(victims)
@@ -0,0 +1,230 @@
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Process, ResultCacheEntry
+from .uploads import prune_upload_sessions
+
+ARTIFACT_UPLOAD = 'upload'
+ARTIFACT_OUTPUT = 'output'
+ARTIFACT_PREVIEW = 'preview'
+ARTIFACT_TEMP = 'temp'
+
+# Process field that points at each kind of stored artifact.
+ARTIFACT_FIELDS = {
+    ARTIFACT_UPLOAD: 'original_file',
+    ARTIFACT_OUTPUT: 'processed_file',
+    ARTIFACT_PREVIEW: 'preview_file',
+}
+# Leftovers of interrupted writes, and the per-job directories older versions created.
+TEMP_SUFFIXES = ('.partial', '.tmp')
+LEGACY_DIRECTORIES = ('generated',)
+
+
+class Artifact:
+    __slots__ = ('kind', 'name', 'size', 'last_used', 'protected')
+
+    def __init__(self, kind, name, size, last_used, protected=False):
+        self.kind = kind
+        self.name = name
+        self.size = size
+        self.last_used = last_used
+        self.protected = protected
+
+
+def ttl_seconds(kind):
+    return {
+        ARTIFACT_UPLOAD: getattr(settings, 'RETENTION_UPLOAD_TTL_SECONDS', 7 * 24 * 3600),
+        ARTIFACT_OUTPUT: getattr(settings, 'RETENTION_OUTPUT_TTL_SECONDS', 7 * 24 * 3600),
+        ARTIFACT_PREVIEW: getattr(settings, 'RETENTION_PREVIEW_TTL_SECONDS', 7 * 24 * 3600),
+        ARTIFACT_TEMP: getattr(settings, 'RETENTION_TEMP_TTL_SECONDS', 24 * 3600),
+    }[kind]
+
+
+def _media_path(name):
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files
+        )
+    return os.path.getsize(path)
+
+
+def _mtime(path):
+    return datetime.fromtimestamp(os.path.getmtime(path), tz=dt_timezone.utc)
+
+
+def collect_artifacts():
+    """
+    Every file under MEDIA_ROOT that retention may delete. Files referenced by
+    processes are dated by their most recent use; a file used by a queued or
+    running job is protected. Anything else (interrupted writes, files no
+    process points at, legacy per-job directories) is temporary, dated by mtime,
+    and protected while a job could still be writing it.
+    """
+    artifacts = []
+    stale_after = timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 1800))
+    now = timezone.now()
+    referenced = set()
+    last_used_by_archive = dict(
+        ResultCacheEntry.objects.values('archive').annotate(last=Max('last_used_at')).values_list('archive', 'last')
+    )
+    for kind, field in ARTIFACT_FIELDS.items():
+        rows = (
+            Process.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .values(field).annotate(last=Max('updated_at'))
+        )
+        active = set(
+            Process.objects.filter(state__in=Process.ACTIVE_STATES).values_list(field, flat=True)
+        )
+        for row in rows:
+            name = row[field]
+            referenced.add(name)
+            path = _media_path(name)
+            if not os.path.exists(path):
+                continue
+            last_used = row['last']
+            if kind == ARTIFACT_OUTPUT and last_used_by_archive.get(name):
+                last_used = max(last_used, last_used_by_archive[name])
+            artifacts.append(Artifact(kind, name, _size(path), last_used, protected=name in active))
+
+    paths = []
+    session_dir = getattr(settings, 'UPLOAD_SESSION_DIR', None) or _media_path('upload_sessions')
+    for root, dirs, files in os.walk(settings.MEDIA_ROOT):
+        if os.path.abspath(root) == os.path.abspath(session_dir):
+            dirs[:] = []
+            continue  # upload sessions expire through prune_upload_sessions
+        if root == settings.MEDIA_ROOT:
+            for legacy in [d for d in dirs if d in LEGACY_DIRECTORIES]:
+                dirs.remove(legacy)
+                paths.extend(entry.path for entry in os.scandir(_media_path(legacy)))
+        for filename in files:
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, settings.MEDIA_ROOT)
+            if name in referenced:
+                continue
+            if root == settings.MEDIA_ROOT and not filename.endswith(TEMP_SUFFIXES):
+                continue  # leave stray top-level files alone
+            paths.append(path)
+
+    for path in paths:
+        try:
+            modified, size = _mtime(path), _size(path)
+        except FileNotFoundError:
+            continue  # finished or cleaned up since the scan
+        name = os.path.relpath(path, settings.MEDIA_ROOT)
+        artifacts.append(Artifact(ARTIFACT_TEMP, name, size, modified, protected=now - modified < stale_after))
+    return artifacts
+
+
+def expire_artifact(kind, name):
+    """
+    Delete a stored artifact and record the expiry on every process that
+    points at it. Output archives also leave the result cache. Returns the
+    number of bytes freed.
+    """
+    path = _media_path(name)
+    try:
+        size = _size(path)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        size = 0
+
+    field = ARTIFACT_FIELDS.get(kind)
+    if field is not None:
+        now = timezone.now()
+        for process in Process.objects.filter(**{field: name}).only('pk', 'expired_artifacts'):
+            expired = dict(process.expired_artifacts or {})
+            expired[kind] = now.isoformat()
+            Process.objects.filter(pk=process.pk).update(expired_artifacts=expired, updated_at=now)
+    if kind == ARTIFACT_OUTPUT:
+        ResultCacheEntry.objects.filter(archive=name).delete()
+    return size
+
+
+def enforce_retention(max_bytes=None, dry_run=False):
+    """
+    Expire artifacts past their kind's TTL, then the least recently used
+    remaining ones until MEDIA_ROOT fits in ``max_bytes`` (default
+    RETENTION_MAX_MEDIA_BYTES, 0 for no quota). Returns a report of what was
+    (or, with ``dry_run``, would be) removed.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'RETENTION_MAX_MEDIA_BYTES', 0)
+    report = {'expired': {}, 'freed_bytes': 0, 'sessions_pruned': 0}
+    if not dry_run:
+        report['sessions_pruned'] = prune_upload_sessions()
+
+    artifacts = collect_artifacts()
+    total = sum(artifact.size for artifact in artifacts)
+    now = timezone.now()
+    victims = []
+    survivors = []
+    for artifact in artifacts:
+        ttl = ttl_seconds(artifact.kind)
+        if not artifact.protected and ttl and now - artifact.last_used > timedelta(seconds=ttl):
+            victims.append(artifact)
+        else:
+            survivors.append(artifact)
+
+    if max_bytes:
+        remaining = total - sum(artifact.size for artifact in victims)
+        for artifact in sorted(survivors, key=lambda a: a.last_used):
+            if remaining <= max_bytes:
+                break
+            if artifact.protected:
+                continue
+            victims.append(artifact)
+            remaining -= artifact.size
+
+    for artifact in victims:
+        freed = artifact.size if dry_run else expire_artifact(artifact.kind, artifact.name)
+        report['expired'][artifact.kind] = report['expired'].get(artifact.kind, 0) + 1
+        report['freed_bytes'] += freed
+    report['media_bytes'] = total - report['freed_bytes']
+    if victims and not dry_run:
+        print(f"🧹 Expired {len(victims)} artifact(s), freed {report['freed_bytes'] / 2**20:.1f} MiB")
+    return report
+
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def start_timer():
+    """Run ``enforce_retention`` every RETENTION_INTERVAL_SECONDS on a daemon thread (0 disables)."""
+    global _timer
+    interval = getattr(settings, 'RETENTION_INTERVAL_SECONDS', 0)
+    if not interval:
+        return None
+    with _timer_lock:
+        # Threads don't survive fork, so a forked worker starts its own timer.
+        if _timer is None or not _timer.is_alive():
+            _timer = threading.Thread(target=_run_timer, args=(interval,), name='retention', daemon=True)
+            _timer.start()
+            print(f"🧹 Retention sweep every {interval}s")
+    return _timer
+
+
+def _run_timer(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            enforce_retention()
+        except Exception as e:
+            print(f"Error in retention sweep: {e}")
+        finally:
+            connections.close_all()
@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import tarfile
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+from django.conf import settings
+
+_executor = None
+_manager = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker(threads):
+    # Workers are spawned, so they need their own Django setup and thread budget.
+    import django
+    import torch
+
+    # A shard loads only the generator it runs; skip the serving-process warmup and job workers.
+    os.environ['MODEL_WARMUP'] = '0'
+    os.environ['JOB_WORKERS_IN_PROCESS'] = '0'
+    django.setup()
+    torch.set_num_threads(threads)
+
+
+def _write_atomic(path, data):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+class ShardCancelled(Exception):
+    pass
+
+
+def _generate_shard(generator_path, shard_path, start, count, steps, seed, counter, stop, preview_path=None, output_format='zip'):
+    from .sinks import open_sink
+    from .utils import generate_images_with_gan, get_generator
+
+    def report(done, total):
+        counter.set(done)
+        # Called after every batch: stop here once the job has failed or been cancelled.
+        if stop.is_set():
+            raise ShardCancelled(f"Shard starting at image {start} cancelled")
+
+    def preview(data):
+        _write_atomic(preview_path, data)
+
+    with open_sink(shard_path, output_format) as sink:
+        generate_images_with_gan(
+            generator_path, sink, num_images=count, steps=steps, seed=seed, first_index=start,
+            progress_callback=report, preview_callback=preview if preview_path else None,
+        )
+    # The registry already holds the generator this shard used.
+    return shard_path, getattr(get_generator(generator_path, steps), 'precision', 'fp32')
+
+
+def shard_ranges(num_images, shards, align=1):
+    """
+    Split ``range(num_images)`` into at most ``shards`` contiguous (start,
+    count) pieces that start at multiples of ``align``.
+    """
+    units = -(-num_images // align)
+    shards = max(1, min(shards, units))
+    base, extra = divmod(units, shards)
+    ranges, start = [], 0
+    for i in range(shards):
+        count = min((base + (1 if i < extra else 0)) * align, num_images - start)
+        ranges.append((start, count))
+        start += count
+    return ranges
+
+
+def _get_executor(workers, threads):
+    """Process pool kept alive across jobs so workers keep their models loaded."""
+    global _executor, _manager
+    with _executor_lock:
+        if _executor is None:
+            context = multiprocessing.get_context('spawn')
+            _manager = context.Manager()
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(threads,)
+            )
+            print(f"🧵 Started {workers} generation worker process(es), {threads} torch thread(s) each")
+        return _executor, _manager
+
+
+def shard_workers():
+    return getattr(settings, 'GAN_SHARD_WORKERS', 0) or 0
+
+
+def should_shard(num_images):
+    return shard_workers() > 1 and num_images >= getattr(settings, 'GAN_SHARD_MIN_IMAGES', 2000)
+
+
+def _copy_shard(path, output_format, sink):
+    """Append a finished shard's images to ``sink`` in order, copying the encoded bytes as they are."""
+    if output_format == 'npy':
+        sink.extend(path)
+    elif output_format == 'tar':
+        with tarfile.open(path) as shard:
+            for member in shard:
+                sink.write_stream(member.name, shard.extractfile(member), member.size)
+    else:
+        with zipfile.ZipFile(path) as shard:
+            for info in shard.infolist():
+                with shard.open(info) as member:
+                    sink.write_stream(info.filename, member, info.file_size)
+
+
+def generate_sharded(generator_path, sink, num_images, steps, seed=None, progress_callback=None, preview_callback=None, output_format='zip'):
+    """
+    Generate ``num_images`` across GAN_SHARD_WORKERS processes. Each shard
+    writes a disjoint ``generated_<index>`` range to its own file in
+    ``output_format``, and the shards are copied into ``sink`` in index
+    order, so the output has the same names as a single-process run. Seeded
+    noise depends only on the image index, so a seed gives the same images
+    whatever the number of shards. Shard 0 writes the first-batch preview to a
+    file, which is handed to ``preview_callback`` once it appears. Returns the
+    precision the shards' generator ran in.
+    """
+    workers = shard_workers()
+    threads = getattr(settings, 'GAN_SHARD_THREADS', 0) or max(1, (os.cpu_count() or 1) // workers)
+    executor, manager = _get_executor(workers, threads)
+    # Seeded images are generated in aligned chunks; don't split one across shards.
+    align = getattr(settings, 'GAN_SEEDED_BATCH_SIZE', 16) if seed is not None else 1
+    ranges = shard_ranges(num_images, workers, align)
+
+    with tempfile.TemporaryDirectory(prefix='shards-') as shard_dir:
+        counters = [manager.Value('i', 0) for _ in ranges]
+        stop = manager.Event()
+        futures = []
+        for i, ((start, count), counter) in enumerate(zip(ranges, counters)):
+            shard_path = os.path.join(shard_dir, f'shard_{i}.{output_format}')
+            preview_path = os.path.join(shard_dir, 'preview.png') if i == 0 and preview_callback else None
+            futures.append(executor.submit(
+                _generate_shard, generator_path, shard_path, start, count, steps, seed, counter, stop, preview_path,
+                output_format,
+            ))
+        print(f"🧩 Generating {num_images} images in {len(ranges)} shards")
+
+        pending = set(futures)
+        preview_path = os.path.join(shard_dir, 'preview.png')
+        preview_sent = preview_callback is None
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()  # re-raise a worker's failure
+                if not preview_sent and os.path.exists(preview_path):
+                    with open(preview_path, 'rb') as f:
+                        preview_callback(f.read())
+                    preview_sent = True
+                if progress_callback is not None:
+                    progress_callback(sum(counter.value for counter in counters), num_images)
+        except BaseException:
+            # Don't start shards of a failed or cancelled job, and stop running ones after their
+            # current batch; wait for them so they are not writing while the shard files are removed.
+            stop.set()
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            raise
+
+        # Merge in shard order
+        for future in futures:
+            _copy_shard(future.result()[0], output_format, sink)
+    print(f"🎉 Merged {len(ranges)} shards")
+    # Every shard applies the same GAN_PRECISION check to the same generator.
+    return futures[0].result()[1]
@@ -0,0 +1,229 @@
+import io
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+
+import numpy as np
+
+
+class OutputSink:
+    """
+    Destination for encoded generated images. ``write`` takes the file name
+    and the already-encoded bytes; the generator loop only ever talks to this
+    interface. ``image_format`` tells it what to encode: 'png', 'webp'
+    (lossless), or 'array' for sinks that take raw uint8 HWC arrays. Used as
+    a context manager, the sink is closed on success and aborted (partial
+    output removed) on error.
+    """
+
+    image_format = 'png'
+
+    def write(self, name, data):
+        raise NotImplementedError
+
+    def write_stream(self, name, source, size):
+        """Like ``write`` for ``size`` encoded bytes read from the file object ``source``."""
+        self.write(name, source.read())
+
+    def close(self):
+        pass
+
+    def abort(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class DirectorySink(OutputSink):
+    def __init__(self, directory, image_format='png'):
+        self.directory = directory
+        self.image_format = image_format
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, name, data):
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(data)
+
+    def write_stream(self, name, source, size):
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            shutil.copyfileobj(source, f)
+
+    def abort(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ZipSink(OutputSink):
+    """
+    Writes each image straight into a ZIP archive. Members are stored rather
+    than deflated because PNG data is already compressed. The archive is built
+    under a temporary name and only moved to ``path`` once it is complete.
+    """
+
+    def __init__(self, path, compression=zipfile.ZIP_STORED, image_format='png'):
+        self.path = path
+        self.image_format = image_format
+        self._partial_path = f'{path}.partial'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._zip = zipfile.ZipFile(self._partial_path, 'w', compression=compression, allowZip64=True)
+        self.count = 0
+
+    def write(self, name, data):
+        self._zip.writestr(name, data)
+        self.count += 1
+
+    def write_stream(self, name, source, size):
+        info = zipfile.ZipInfo(name, date_time=time.localtime(time.time())[:6])
+        info.compress_type = self._zip.compression
+        info.file_size = size
+        with self._zip.open(info, 'w') as member:
+            shutil.copyfileobj(source, member)
+        self.count += 1
+
+    def close(self):
+        if self._zip is None:
+            return
+        self._zip.close()
+        self._zip = None
+        os.replace(self._partial_path, self.path)
+
+    def abort(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if os.path.exists(self._partial_path):
+            os.remove(self._partial_path)
+
+
+class TarSink(OutputSink):
+    """Like ``ZipSink`` but an uncompressed tar, which most training data loaders can stream directly."""
+
+    def __init__(self, path, image_format='png'):
+        self.path = path
+        self.image_format = image_format
+        self._partial_path = f'{path}.partial'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._tar = tarfile.open(self._partial_path, 'w', format=tarfile.PAX_FORMAT)
+        self._mtime = time.time()
+        self.count = 0
+
+    def write(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self._mtime
+        self._tar.addfile(info, io.BytesIO(data))
+        self.count += 1
+
+    def write_stream(self, name, source, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = self._mtime
+        self._tar.addfile(info, source)
+        self.count += 1
+
+    def close(self):
+        if self._tar is None:
+            return
+        self._tar.close()
+        self._tar = None
+        os.replace(self._partial_path, self.path)
+
+    def abort(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        if os.path.exists(self._partial_path):
+            os.remove(self._partial_path)
+
+
+class NpySink(OutputSink):
+    """
+    Stacks raw images into one ``.npy`` file of shape (N, H, W, 3) uint8 that
+    can be memory-mapped with ``np.load(path, mmap_mode='r')``. Pixels are
+    appended as they arrive; the header, whose size is reserved up front, is
+    filled in with the final count on close.
+    """
+
+    image_format = 'array'
+    HEADER_BYTES = 128
+
+    def __init__(self, path):
+        self.path = path
+        self._partial_path = f'{path}.partial'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(self._partial_path, 'wb')
+        self._file.write(b'\0' * self.HEADER_BYTES)
+        self._image_shape = None
+        self.count = 0
+
+    def write(self, name, data):
+        array = np.ascontiguousarray(data, dtype=np.uint8)
+        if self._image_shape is None:
+            self._image_shape = array.shape
+        elif array.shape != self._image_shape:
+            raise ValueError(f"{name} has shape {array.shape}, expected {self._image_shape}")
+        self._file.write(array.tobytes())
+        self.count += 1
+
+    def extend(self, path):
+        """Append every image of the ``.npy`` file at ``path`` by copying its pixel data."""
+        with open(path, 'rb') as source:
+            if np.lib.format.read_magic(source) == (1, 0):
+                shape, _, _ = np.lib.format.read_array_header_1_0(source)
+            else:
+                shape, _, _ = np.lib.format.read_array_header_2_0(source)
+            if not shape[0]:
+                return
+            if self._image_shape is None:
+                self._image_shape = tuple(shape[1:])
+            elif tuple(shape[1:]) != self._image_shape:
+                raise ValueError(f"{path} has images of shape {shape[1:]}, expected {self._image_shape}")
+            shutil.copyfileobj(source, self._file)
+        self.count += shape[0]
+
+    def close(self):
+        if self._file is None:
+            return
+        shape = (self.count,) + (self._image_shape or (0, 0, 3))
+        self._file.seek(0)
+        np.lib.format.write_array_header_1_0(self._file, {'descr': '|u1', 'fortran_order': False, 'shape': shape})
+        if self._file.tell() != self.HEADER_BYTES:
+            raise ValueError(f"npy header for shape {shape} does not fit in {self.HEADER_BYTES} bytes")
+        self._file.close()
+        self._file = None
+        os.replace(self._partial_path, self.path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self._partial_path):
+            os.remove(self._partial_path)
+
+
+# Output format -> (file extension, image encoding).
+OUTPUT_FORMATS = {
+    'zip': ('.zip', 'png'),
+    'tar': ('.tar', 'png'),
+    'webp': ('.zip', 'webp'),
+    'npy': ('.npy', 'array'),
+}
+
+
+def open_sink(path, output_format='zip'):
+    """Sink writing ``output_format`` to ``path`` (which should end in that format's extension)."""
+    image_format = OUTPUT_FORMATS[output_format][1]
+    if output_format == 'npy':
+        return NpySink(path)
+    if output_format == 'tar':
+        return TarSink(path, image_format=image_format)
+    return ZipSink(path, image_format=image_format)
@@ -1,3 +1,413 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import result_cache, retention
+from .models import Process, ResultCacheEntry, UploadSession
+
+
+class MediaTestCase(TestCase):
+    """Runs each test against an empty temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(prefix='media-')
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root, UPLOAD_SESSION_DIR=os.path.join(self.media_root, 'upload_sessions'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def write_media(self, name, size=100, age=0):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'\0' * size)
+        if age:
+            modified = time.time() - age
+            os.utime(path, (modified, modified))
+        return path
+
+    def make_process(self, state=Process.STATE_DONE, age=0, **files):
+        process = Process.objects.create(multiplier=1, state=state, **files)
+        if age:
+            Process.objects.filter(pk=process.pk).update(updated_at=timezone.now() - timedelta(seconds=age))
+        return process
+
+
+class RetentionTests(MediaTestCase):
+    def test_collect_artifacts_classifies_media(self):
+        self.write_media('uploads/done.zip', size=10)
+        self.write_media('generated_zips/done.zip', size=20)
+        self.write_media('uploads/queued.zip', size=30)
+        self.write_media('generated_zips/orphan.zip', size=40, age=7200)
+        self.write_media('generated_zips/writing.zip.partial', size=50)
+        self.write_media('notes.txt')
+        self.make_process(original_file='uploads/done.zip', processed_file='generated_zips/done.zip')
+        self.make_process(state=Process.STATE_QUEUED, original_file='uploads/queued.zip')
+
+        artifacts = {artifact.name: artifact for artifact in retention.collect_artifacts()}
+
+        self.assertNotIn('notes.txt', artifacts)
+        self.assertEqual(artifacts['uploads/done.zip'].kind, retention.ARTIFACT_UPLOAD)
+        self.assertEqual(artifacts['generated_zips/done.zip'].kind, retention.ARTIFACT_OUTPUT)
+        self.assertEqual(artifacts['generated_zips/done.zip'].size, 20)
+        self.assertFalse(artifacts['uploads/done.zip'].protected)
+        self.assertTrue(artifacts['uploads/queued.zip'].protected)
+        self.assertEqual(artifacts['generated_zips/orphan.zip'].kind, retention.ARTIFACT_TEMP)
+        self.assertFalse(artifacts['generated_zips/orphan.zip'].protected)
+        # A job could still be writing a recent temporary file.
+        self.assertTrue(artifacts['generated_zips/writing.zip.partial'].protected)
+
+    def test_expire_artifact_deletes_file_and_records_expiry(self):
+        path = self.write_media('generated_zips/out.zip', size=64)
+        process = self.make_process(original_file='uploads/in.zip', processed_file='generated_zips/out.zip')
+        ResultCacheEntry.objects.create(
+            key='k', content_hash='h', multiplier=1, weights_version='v', classification_summary={},
+            gan_used='g', archive='generated_zips/out.zip', size_bytes=64,
+        )
+
+        freed = retention.expire_artifact(retention.ARTIFACT_OUTPUT, 'generated_zips/out.zip')
+
+        self.assertEqual(freed, 64)
+        self.assertFalse(os.path.exists(path))
+        process.refresh_from_db()
+        self.assertIn(retention.ARTIFACT_OUTPUT, process.expired_artifacts)
+        self.assertFalse(ResultCacheEntry.objects.exists())
+        # Already gone: nothing freed, nothing raised.
+        self.assertEqual(retention.expire_artifact(retention.ARTIFACT_OUTPUT, 'generated_zips/out.zip'), 0)
+
+    @override_settings(RETENTION_OUTPUT_TTL_SECONDS=3600, RETENTION_UPLOAD_TTL_SECONDS=0)
+    def test_dry_run_reports_without_deleting(self):
+        upload = self.write_media('uploads/in.zip', size=10)
+        output = self.write_media('generated_zips/out.zip', size=20)
+        process = self.make_process(age=7200, original_file='uploads/in.zip', processed_file='generated_zips/out.zip')
+
+        report = retention.enforce_retention(dry_run=True)
+
+        self.assertEqual(report['expired'], {retention.ARTIFACT_OUTPUT: 1})
+        self.assertEqual(report['freed_bytes'], 20)
+        self.assertTrue(os.path.exists(output))
+        process.refresh_from_db()
+        self.assertIsNone(process.expired_artifacts)
+
+        retention.enforce_retention()
+
+        self.assertFalse(os.path.exists(output))
+        self.assertTrue(os.path.exists(upload))
+
+    @override_settings(RETENTION_OUTPUT_TTL_SECONDS=0, RETENTION_UPLOAD_TTL_SECONDS=0)
+    def test_quota_expires_least_recently_used_first(self):
+        old = self.write_media('generated_zips/old.zip', size=100)
+        new = self.write_media('generated_zips/new.zip', size=100)
+        self.make_process(age=600, processed_file='generated_zips/old.zip')
+        self.make_process(processed_file='generated_zips/new.zip')
+
+        report = retention.enforce_retention(max_bytes=150)
+
+        self.assertEqual(report['media_bytes'], 100)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+
+
+class ResultCacheEvictionTests(MediaTestCase):
+    def make_entry(self, key, archive, size=100):
+        return ResultCacheEntry.objects.create(
+            key=key, content_hash=key, multiplier=1, weights_version='v', classification_summary={},
+            gan_used='g', archive=archive, size_bytes=size,
+        )
+
+    def test_eviction_keeps_archives_processes_still_use(self):
+        kept = self.write_media('generated_zips/kept.zip')
+        dropped = self.write_media('generated_zips/dropped.zip')
+        process = self.make_process(processed_file='generated_zips/kept.zip')
+        self.make_entry('a', 'generated_zips/kept.zip')
+        self.make_entry('b', 'generated_zips/dropped.zip')
+
+        self.assertEqual(result_cache.evict(max_age=0, max_bytes=1), 2)
+
+        self.assertFalse(ResultCacheEntry.objects.exists())
+        self.assertTrue(os.path.exists(kept))
+        self.assertFalse(os.path.exists(dropped))
+        process.refresh_from_db()
+        self.assertIsNone(process.expired_artifacts)
+
+
+def make_zip(images=2):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for i in range(images):
+            image = io.BytesIO()
+            Image.new('RGB', (8, 8), (i * 40, 0, 0)).save(image, format='PNG')
+            archive.writestr(f'cell_{i}.png', image.getvalue())
+    return buffer.getvalue()
+
+
+class UploadSessionTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = make_zip()
+        response = self.client.post(
+            reverse('upload_create'), {'filename': 'cells.zip', 'size': len(self.data)}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.url = reverse('upload_session', args=[response.json()['id']])
+        self.finalize_url = reverse('upload_finalize', args=[response.json()['id']])
+
+    def put(self, first, last, body=None, total=None):
+        if body is None:
+            body = self.data[first:last + 1]
+        return self.client.put(
+            self.url, body, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {first}-{last}/{len(self.data) if total is None else total}',
+        )
+
+    def upload_all(self):
+        for first in range(0, len(self.data), 100):
+            last = min(first + 100, len(self.data)) - 1
+            self.assertEqual(self.put(first, last).status_code, 200)
+
+    def test_out_of_order_chunk_conflicts(self):
+        response = self.put(100, 199)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 0)
+
+    def test_duplicate_chunk_conflicts(self):
+        self.assertEqual(self.put(0, 99).status_code, 200)
+        response = self.put(0, 99)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 100)
+
+    def test_resume_from_reported_offset(self):
+        self.assertEqual(self.put(0, 99).status_code, 200)
+        # A short chunk is rejected and leaves the offset where it was.
+        self.assertEqual(self.put(100, 199, body=self.data[100:150]).status_code, 400)
+        offset = self.client.get(self.url).json()['offset']
+        self.assertEqual(offset, 100)
+        self.assertEqual(self.put(offset, len(self.data) - 1).status_code, 200)
+
+        response = self.client.post(self.finalize_url, {'multiplier': 1}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        process = Process.objects.get(pk=response.json()['id'])
+        self.assertEqual(process.content_hash, hashlib.sha256(self.data).hexdigest())
+        with open(os.path.join(self.media_root, process.original_file.name), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_content_range_total_must_match_size(self):
+        self.assertEqual(self.put(0, 99, total=len(self.data) + 1).status_code, 400)
+        self.assertEqual(self.put(0, 99, total='*').status_code, 200)
+
+    def test_body_must_match_content_range(self):
+        self.assertEqual(self.put(0, 99, body=self.data[:120]).status_code, 400)
+        self.assertEqual(self.client.get(self.url).json()['offset'], 0)
+
+    def test_finalize_rejects_wrong_digest(self):
+        self.upload_all()
+
+        response = self.client.post(
+            self.finalize_url, {'multiplier': 1, 'sha256': hashlib.sha256(b'other').hexdigest()},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('checksum', response.json()['error'])
+        self.assertFalse(Process.objects.exists())
+        self.assertTrue(UploadSession.objects.exists())
+
+        response = self.client.post(
+            self.finalize_url, {'multiplier': 1, 'sha256': hashlib.sha256(self.data).hexdigest()},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+
+
+class ProcessStatusTests(TestCase):
+    def test_poll_revalidates_by_etag_only(self):
+        process = Process.objects.create(multiplier=1)
+        url = reverse('process_retrieve', args=[process.pk])
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Updates within the same second must not look unchanged to If-Modified-Since.
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200)
+
+        Process.objects.filter(pk=process.pk).update(progress=50, updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MetricsTests(TestCase):
+    def test_model_registry_is_published(self):
+        import torch.nn as nn
+
+        from .model_registry import ModelRegistry
+
+        registry = ModelRegistry()
+        path = os.path.join(tempfile.mkdtemp(prefix='weights-'), 'model.pth')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        registry.get(('metrics-test', path), path, lambda: nn.Linear(4, 4))
+        registry.get(('metrics-test', path), path, lambda: nn.Linear(4, 4))
+
+        body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('sicklecell_model_registry_lookups_total{model="metrics-test",result="hit"} 1', body)
+        self.assertIn('sicklecell_model_registry_lookups_total{model="metrics-test",result="miss"} 1', body)
+        self.assertIn('sicklecell_model_registry_resident_bytes 80', body)
+
+    @override_settings(GAN_MAX_BATCH_SIZE=2, GAN_MEMORY_CEILING_MB=0)
+    def test_tuned_batch_sizes_are_published(self):
+        from .autotune import BatchSizeTuner
+
+        def generator(noise, alpha=1, steps=None, rng=None):
+            return noise * alpha
+
+        size = BatchSizeTuner().batch_size_for(('/models/metrics_test.pth', 3), generator, 3, 8, 'cpu')
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(f'sicklecell_gan_tuned_batch_size{{generator="metrics_test.pth",steps="3"}} {size}', body)
+        self.assertIn('sicklecell_gan_tuned_images_per_second{generator="metrics_test.pth",steps="3"}', body)
+
+
+class ShardRangesTests(TestCase):
+    def test_unaligned_ranges_split_evenly(self):
+        from .sharding import shard_ranges
+
+        self.assertEqual(shard_ranges(100, 3), [(0, 34), (34, 33), (67, 33)])
+        self.assertEqual(shard_ranges(2, 4), [(0, 1), (1, 1)])
+
+    def test_aligned_ranges_start_on_chunk_boundaries(self):
+        from .sharding import shard_ranges
+
+        self.assertEqual(shard_ranges(100, 3, 16), [(0, 48), (48, 32), (80, 20)])
+        self.assertEqual(shard_ranges(33, 2, 16), [(0, 32), (32, 1)])
+        self.assertEqual(shard_ranges(64, 4, 16), [(0, 16), (16, 16), (32, 16), (48, 16)])
+
+    def test_fewer_chunks_than_shards(self):
+        from .sharding import shard_ranges
+
+        self.assertEqual(shard_ranges(10, 4, 16), [(0, 10)])
+        self.assertEqual(shard_ranges(0, 3), [(0, 0)])
+
+
+class ShardedGenerationTests(TestCase):
+    """Runs a tiny random generator in spawned shard workers; slower than the other tests."""
+
+    def setUp(self):
+        import torch
+
+        from .utils import CHANNELS_IMG, IN_CHANNELS, W_DIM, Z_DIM, Generator
+
+        directory = tempfile.mkdtemp(prefix='shards-test-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.directory = directory
+        self.generator_path = os.path.join(directory, 'generator_test.pth')
+        torch.manual_seed(0)
+        torch.save(Generator(Z_DIM, W_DIM, IN_CHANNELS, CHANNELS_IMG).state_dict(), self.generator_path)
+
+        # Shard workers are spawned and read their settings from the environment.
+        environment = {
+            'GAN_SEEDED_BATCH_SIZE': '4', 'GAN_PRECISION': 'fp32',
+            'MODEL_WEIGHTS_DIR': os.path.join(directory, 'model_weights'),
+        }
+        patcher = mock.patch.dict(os.environ, environment)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        overrides = override_settings(
+            GAN_SHARD_WORKERS=2, GAN_SHARD_THREADS=1, GAN_SEEDED_BATCH_SIZE=4, GAN_PRECISION='fp32',
+            MODEL_WEIGHTS_DIR=environment['MODEL_WEIGHTS_DIR'],
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(self.stop_workers)
+
+    def stop_workers(self):
+        from . import sharding
+
+        with sharding._executor_lock:
+            if sharding._executor is not None:
+                sharding._executor.shutdown()
+                sharding._manager.shutdown()
+            sharding._executor = sharding._manager = None
+
+    def test_seeded_output_matches_single_process(self):
+        import numpy as np
+
+        from .sharding import generate_sharded
+        from .sinks import NpySink
+        from .utils import generate_images_with_gan
+
+        single, sharded = os.path.join(self.directory, 'single.npy'), os.path.join(self.directory, 'sharded.npy')
+        with NpySink(single) as sink:
+            generate_images_with_gan(self.generator_path, sink, num_images=10, steps=1, seed=7)
+        with NpySink(sharded) as sink:
+            generate_sharded(self.generator_path, sink, 10, 1, seed=7, output_format='npy')
+
+        expected, actual = np.load(single), np.load(sharded)
+        self.assertEqual(len(expected), 10)
+        np.testing.assert_array_equal(actual, expected)
+
+
+class NpySinkTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='npy-sink-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write_images(self, name, count, start=0):
+        import numpy as np
+
+        from .sinks import NpySink
+
+        path = os.path.join(self.directory, name)
+        with NpySink(path) as sink:
+            for i in range(start, start + count):
+                sink.write(f'generated_{i}.png', np.full((4, 5, 3), i, dtype=np.uint8))
+        return path
+
+    def test_writes_stacked_images(self):
+        import numpy as np
+
+        array = np.load(self.write_images('images.npy', 3))
+
+        self.assertEqual(array.shape, (3, 4, 5, 3))
+        self.assertEqual(array.dtype, np.uint8)
+        self.assertEqual([int(image.max()) for image in array], [0, 1, 2])
+
+    def test_extend_appends_another_file(self):
+        import numpy as np
+
+        from .sinks import NpySink
+
+        first, second = self.write_images('first.npy', 2), self.write_images('second.npy', 3, start=2)
+        merged = os.path.join(self.directory, 'merged.npy')
+        with NpySink(merged) as sink:
+            sink.extend(first)
+            sink.extend(self.write_images('empty.npy', 0))
+            sink.extend(second)
+
+        array = np.load(merged)
+        self.assertEqual(sink.count, 5)
+        self.assertEqual(array.shape, (5, 4, 5, 3))
+        self.assertEqual([int(image.max()) for image in array], [0, 1, 2, 3, 4])
+
+    def test_extend_rejects_other_image_shapes(self):
+        import numpy as np
+
+        from .sinks import NpySink
+
+        other = os.path.join(self.directory, 'other.npy')
+        np.save(other, np.zeros((2, 8, 8, 3), dtype=np.uint8))
+        with NpySink(os.path.join(self.directory, 'mixed.npy')) as sink:
+            sink.write('generated_0.png', np.zeros((4, 5, 3), dtype=np.uint8))
+            with self.assertRaises(ValueError):
+                sink.extend(other)
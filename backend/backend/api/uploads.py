@@ -0,0 +1,197 @@
+import hashlib
+import os
+import threading
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.utils import timezone
+
+from .archives import ArchiveRejected, image_members
+from .models import Process, UploadSession
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Pass-through upload handler that computes the SHA-256 of each uploaded
+    file while Django streams it to memory or disk. Must be listed first in
+    FILE_UPLOAD_HANDLERS; the digests end up in ``request.upload_sha256``
+    keyed by field name.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_sha256'):
+            self.request.upload_sha256 = {}
+        self.request.upload_sha256[self.field_name] = self._digest.hexdigest()
+        return None
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadError(ValueError):
+    """A chunk or finalize request that doesn't fit its upload session."""
+
+
+class OffsetMismatch(UploadError):
+    """The chunk does not start where the session's data ends; ``expected`` is where it should."""
+
+    def __init__(self, expected):
+        super().__init__(f"Expected a chunk starting at byte {expected}")
+        self.expected = expected
+
+
+# Running digests of in-progress sessions: session id -> (bytes hashed, sha256).
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def session_path(session):
+    directory = getattr(settings, 'UPLOAD_SESSION_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'upload_sessions')
+    return os.path.join(directory, f'{session.pk}.part')
+
+
+def _digest_at(session, offset):
+    """
+    SHA-256 of the session's first ``offset`` bytes. Normally this is the
+    digest kept from the previous chunk; if another worker took that chunk or
+    the server restarted, it is rebuilt from the file on disk.
+    """
+    with _digests_lock:
+        cached = _digests.get(session.pk)
+    if cached is not None and cached[0] == offset:
+        return cached[1].copy()
+    digest = hashlib.sha256()
+    if offset:
+        with open(session_path(session), 'rb') as f:
+            left = offset
+            while left:
+                data = f.read(min(HASH_CHUNK_SIZE, left))
+                if not data:
+                    raise UploadError('Upload data on disk is shorter than recorded')
+                digest.update(data)
+                left -= len(data)
+    return digest
+
+
+def receive_chunk(session, offset, length, stream):
+    """
+    Write ``length`` bytes from ``stream`` at ``offset`` of the session file.
+    Chunks must arrive in order; the session only advances once the whole
+    chunk has been written, so an interrupted chunk can simply be resent.
+    """
+    if offset != session.received_bytes:
+        raise OffsetMismatch(session.received_bytes)
+    max_chunk = getattr(settings, 'UPLOAD_CHUNK_MAX_BYTES', 16 * 2**20)
+    if length <= 0 or length > max_chunk:
+        raise UploadError(f"Chunks must be between 1 and {max_chunk} bytes")
+    limit = session.size if session.size is not None else getattr(settings, 'UPLOAD_MAX_BYTES', 4 * 2**30)
+    if offset + length > limit:
+        raise UploadError(f"Chunk runs past the end of the upload ({limit} bytes)")
+
+    digest = _digest_at(session, offset)
+    path = session_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(offset)
+        while written < length:
+            data = stream.read(min(HASH_CHUNK_SIZE, length - written))
+            if not data:
+                break
+            f.write(data)
+            digest.update(data)
+            written += len(data)
+    if written != length:
+        raise UploadError(f"Chunk ended after {written} of {length} bytes")
+
+    end = offset + length
+    advanced = UploadSession.objects.filter(pk=session.pk, received_bytes=offset).update(
+        received_bytes=end, updated_at=timezone.now()
+    )
+    if not advanced:
+        session.refresh_from_db()
+        raise OffsetMismatch(session.received_bytes)
+    with _digests_lock:
+        _digests[session.pk] = (end, digest)
+    session.received_bytes = end
+
+
+def finalize_upload(session, expected_sha256=None):
+    """
+    Check the assembled file is complete, matches ``expected_sha256`` if the
+    client sent one, and is a ZIP whose central directory lists an acceptable
+    number of images, without extracting anything. Returns ``(path, sha256,
+    image count)``.
+    """
+    if session.size is not None and session.received_bytes != session.size:
+        raise UploadError(f"Upload incomplete: {session.received_bytes} of {session.size} bytes received")
+    path = session_path(session)
+    if not session.received_bytes or not os.path.exists(path):
+        raise UploadError('No data uploaded')
+    # Drop bytes left behind by a chunk that was never accepted.
+    with open(path, 'r+b') as f:
+        f.truncate(session.received_bytes)
+    content_hash = _digest_at(session, session.received_bytes).hexdigest()
+    if expected_sha256 is not None and expected_sha256.lower() != content_hash:
+        raise UploadError(f"Upload checksum mismatch: received data has SHA-256 {content_hash}")
+
+    try:
+        with zipfile.ZipFile(path) as zip_ref:
+            members = image_members(zip_ref)
+    except zipfile.BadZipFile as e:
+        raise UploadError(f"Not a valid ZIP archive: {e}") from e
+    except ArchiveRejected as e:
+        raise UploadError(str(e)) from e
+    if not members:
+        raise UploadError('Archive contains no images')
+
+    with _digests_lock:
+        _digests.pop(session.pk, None)
+    return path, content_hash, len(members)
+
+
+def store_upload(path, filename):
+    """Move a finished upload to where ``Process.original_file`` would have saved it; return the storage name."""
+    field = Process._meta.get_field('original_file')
+    name = default_storage.get_available_name(field.generate_filename(None, filename))
+    target = default_storage.path(name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+    return name
+
+
+def discard_session(session):
+    with _digests_lock:
+        _digests.pop(session.pk, None)
+    try:
+        os.remove(session_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def prune_upload_sessions():
+    """Delete upload sessions that have not received a chunk for UPLOAD_SESSION_MAX_AGE_SECONDS."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'UPLOAD_SESSION_MAX_AGE_SECONDS', 24 * 3600))
+    stale = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    for session in stale:
+        discard_session(session)
+    return len(stale)
@@ -1,9 +1,26 @@
 from django.urls import path
-from .views import ModelInspectView, ProcessCreateView, ProcessDataView, ProcessRetrieveView
+from .events import process_events
+from .views import (
+    MetricsView,
+    ModelInspectView,
+    ProcessCancelView,
+    ProcessCreateView,
+    ProcessDataView,
+    ProcessRetrieveView,
+    UploadFinalizeView,
+    UploadSessionCreateView,
+    UploadSessionView,
+)
 
 urlpatterns = [
     path('processes/', ProcessCreateView.as_view(), name='process_create'),
     path('processes/<int:pk>/process_data/', ProcessDataView.as_view(), name='process_data'),
     path('processes/<int:pk>/', ProcessRetrieveView.as_view(), name='process_retrieve'),
+    path('processes/<int:pk>/cancel/', ProcessCancelView.as_view(), name='process_cancel'),
+    path('processes/<int:pk>/events/', process_events, name='process_events'),
+    path('uploads/', UploadSessionCreateView.as_view(), name='upload_create'),
+    path('uploads/<uuid:pk>/', UploadSessionView.as_view(), name='upload_session'),
+    path('uploads/<uuid:pk>/finalize/', UploadFinalizeView.as_view(), name='upload_finalize'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('inspect-models/', ModelInspectView.as_view(), name='inspect_models'),
 ]
\ No newline at end of file
@@ -2,8 +2,32 @@ import torch
 import torch.nn as nn
 from torchvision import transforms, models
 from PIL import Image
+import contextvars
+import hashlib
+import io
+import math
 import os
-from torchvision.utils import save_image
+import queue
+import random
+import time
+import zipfile
+import threading
+from collections import deque
+from statistics import NormalDist
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from django.conf import settings
+from django.db import connections
+
+from .archives import IMAGE_EXTENSIONS, ArchiveRejected, image_members, max_member_bytes
+from .autotune import get_batch_size_tuner
+from .inference_server import get_inference_server
+from .instrumentation import IMAGES_CLASSIFIED, current_timings, record_stage, timed
+from .model_registry import get_registry
+from .precision import apply_classifier_precision, apply_generator_precision
+from .prediction_cache import CachedPrediction, PredictionCache
+from .sinks import DirectorySink
+from .weights import load_weights
 
 # === Shared Config ===
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
@@ -24,29 +48,241 @@ FACTORS = [1, 1, 1, 0.5, 0.25, 0.125, 0.0625, 0.03125, 0.03125]
 def load_classifier_model():
     model = models.resnet18(weights=None)
     model.fc = nn.Linear(model.fc.in_features, 2)
-    model.load_state_dict(torch.load(CLASSIFIER_MODEL_PATH, map_location=DEVICE))
+    # assign=True keeps the memory-mapped tensors instead of copying them into fresh parameters.
+    model.load_state_dict(load_weights(CLASSIFIER_MODEL_PATH, map_location=DEVICE), assign=True)
     model.to(DEVICE)
     model.eval()
     return model
 
-def classify_images(input_folder):
-    model = load_classifier_model()
-    count_by_class = {0: 0, 1: 0}
-
-    with torch.no_grad():
-        for root, _, files in os.walk(input_folder):
-            for filename in files:
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    image_path = os.path.join(root, filename)
+def get_classifier_model():
+    mode = getattr(settings, 'CLASSIFIER_PRECISION', 'fp32')
+    return get_registry().get(
+        ('classifier', CLASSIFIER_MODEL_PATH, mode),
+        CLASSIFIER_MODEL_PATH,
+        lambda: apply_classifier_precision(load_classifier_model(), mode, _load_image_bytes_tensor, DEVICE),
+    )
+
+def decoder_version():
+    """Which image loader feeds the classifier; reduced JPEG decoding can shift logits slightly."""
+    return 'fast-decode' if getattr(settings, 'CLASSIFIER_FAST_DECODE', True) else 'transform'
+
+MAX_REPORTED_ERRORS = 20
+
+def decode_image_tensor(data, size=224):
+    """
+    ``TRANSFORM`` on the RGB image, with less work: RGB images skip
+    ``convert``, and the normalized tensor is built in one pass from the
+    resized pixels instead of via ToTensor and Normalize. PNGs match
+    ``TRANSFORM`` exactly. JPEGs are decoded at the smallest DCT scale still
+    at least ``size`` pixels, so they only approximate it (values can differ
+    by up to about 0.09 per channel); ``decoder_version`` keys caches on this.
+    """
+    image = Image.open(io.BytesIO(data))
+    if image.format == 'JPEG':
+        image.draft('RGB', (size, size))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = image.resize((size, size), Image.BILINEAR)
+    pixels = torch.frombuffer(bytearray(image.tobytes()), dtype=torch.uint8).view(size, size, 3)
+    # (x / 255 - 0.5) / 0.5 == x / 127.5 - 1
+    return pixels.permute(2, 0, 1).to(torch.float32, memory_format=torch.contiguous_format).div_(127.5).sub_(1)
+
+def _load_image_bytes_tensor(data):
+    if getattr(settings, 'CLASSIFIER_FAST_DECODE', True):
+        return decode_image_tensor(data)
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    return TRANSFORM(image)
+
+def _decode_payload(payload):
+    if isinstance(payload, Exception):
+        raise payload
+    return _load_image_bytes_tensor(payload)
+
+def _iter_zip_images(zip_ref, members):
+    max_member = max_member_bytes()
+    for info in members:
+        if info.file_size > max_member:
+            yield info.filename, ArchiveRejected(f"{info.file_size} bytes exceeds per-image limit")
+            continue
+        try:
+            with timed('read_archive'), zip_ref.open(info) as member:
+                # Don't trust the declared size: read at most one byte past the limit.
+                data = member.read(max_member + 1)
+        except (zipfile.BadZipFile, OSError, RuntimeError, EOFError) as e:
+            # A corrupt or encrypted member fails on its own, like an unreadable file.
+            yield info.filename, e
+            continue
+        if len(data) > max_member:
+            yield info.filename, ArchiveRejected(f"image exceeds per-image limit of {max_member} bytes")
+            continue
+        yield info.filename, data
+
+def _iter_image_files(input_folder):
+    for root, _, files in os.walk(input_folder):
+        for filename in files:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, filename)
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                except OSError as e:
+                    data = e
+                yield os.path.relpath(path, input_folder), data
+
+def _prefetch_decoded(sources, decode, workers, depth):
+    """
+    Decode ``(name, payload)`` sources on a thread pool and yield
+    ``(name, tensor, error)`` in source order. At most ``depth`` decoded or
+    in-flight images are held at once, so memory stays bounded.
+    """
+    pending = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def safe_decode(payload):
+        try:
+            return decode(payload), None
+        except Exception as e:
+            return None, e
+
+    def produce(pool):
+        try:
+            for name, payload in sources:
+                future = pool.submit(safe_decode, payload)
+                while not stop.is_set():
                     try:
-                        image = Image.open(image_path).convert('RGB')
-                        img_tensor = TRANSFORM(image).unsqueeze(0).to(DEVICE)
-                        output = model(img_tensor)
-                        pred = torch.argmax(output, dim=1).item()
-                        count_by_class[pred] += 1
-                    except Exception as e:
-                        print(f"Error processing {image_path}: {e}")
-
+                        pending.put((name, future), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            pending.put((None, e))
+        finally:
+            # Sources may query the database from this thread.
+            connections.close_all()
+            pending.put(done)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decode') as pool:
+        # Run the producer in a copy of this context so it records into the same job timings.
+        producer = threading.Thread(target=contextvars.copy_context().run, args=(produce, pool), daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is done:
+                    break
+                name, future = item
+                if name is None:
+                    raise future
+                tensor, error = future.result()
+                yield name, tensor, error
+        finally:
+            stop.set()
+            while producer.is_alive():
+                try:
+                    pending.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+def _classify_stream(sources, batch_size=None, total=None, progress_callback=None, should_stop=None):
+    """
+    Classify ``(name, image bytes)`` sources. Images already in the prediction
+    cache skip decoding and the model; the rest are decoded on a thread pool
+    and run through the classifier in stacked batches, through the shared
+    inference server when CLASSIFIER_INFERENCE_SERVER is on.
+
+    ``should_stop(count_by_class, error_count)`` is checked whenever no batch is
+    pending; returning True ends classification early, with every source
+    consumed so far counted.
+    """
+    batch_size = batch_size or getattr(settings, 'CLASSIFIER_BATCH_SIZE', 32)
+    workers = getattr(settings, 'CLASSIFIER_DECODE_WORKERS', None) or min(4, os.cpu_count() or 1)
+    model = get_classifier_model()
+    server = get_inference_server() if getattr(settings, 'CLASSIFIER_INFERENCE_SERVER', True) else None
+    count_by_class = {0: 0, 1: 0}
+    errors = []
+    error_count = 0
+    cache_hits = 0
+    batch = []
+    batch_digests = []
+    timings = current_timings()
+
+    if getattr(settings, 'IMAGE_PREDICTION_CACHE_ENABLED', True):
+        cache = PredictionCache(CLASSIFIER_MODEL_PATH, model.precision, decoder_version())
+        items = cache.annotate(sources)
+    else:
+        cache = None
+        items = ((name, (None, payload)) for name, payload in sources)
+
+    def decode_item(item):
+        if isinstance(item, CachedPrediction):
+            return item
+        digest, payload = item
+        start = time.perf_counter()
+        tensor = _decode_payload(payload)
+        record_stage('decode', time.perf_counter() - start, timings)
+        return digest, tensor
+
+    def stopping():
+        return should_stop is not None and not batch and should_stop(count_by_class, error_count)
+
+    def report_progress():
+        if progress_callback is not None:
+            progress_callback(sum(count_by_class.values()) + error_count, total)
+
+    def run_batch():
+        with timed('classify_forward'):
+            stacked = torch.stack(batch).to(DEVICE)
+            logits = server.submit(model, stacked).result() if server is not None else model(stacked)
+            preds = torch.argmax(logits, dim=1).tolist()
+        for pred in preds:
+            count_by_class[pred] += 1
+        if cache is not None:
+            with timed('prediction_cache_store'):
+                cache.store(batch_digests, logits.tolist(), preds)
+        batch.clear()
+        batch_digests.clear()
+        report_progress()
+
+    with torch.no_grad(), server.client() if server is not None else nullcontext():
+        for name, result, error in _prefetch_decoded(items, decode_item, workers, depth=batch_size * 2):
+            if error is not None:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'file': name, 'error': str(error)})
+                print(f"Error processing {name}: {error}")
+                continue
+            if isinstance(result, CachedPrediction):
+                count_by_class[result.predicted_class] += 1
+                cache_hits += 1
+                if cache_hits % batch_size == 0:
+                    report_progress()
+                if stopping():
+                    break
+                continue
+            digest, tensor = result
+            batch.append(tensor)
+            batch_digests.append(digest)
+            if len(batch) >= batch_size:
+                run_batch()
+                if stopping():
+                    break
+        if batch:
+            run_batch()
+    report_progress()
+
+    summary = _summarize_classification(count_by_class, error_count, errors)
+    classified = summary['total_images']
+    summary['cache_hits'] = cache_hits
+    summary['cache_hit_ratio'] = round(cache_hits / classified, 4) if classified else 0
+    summary['classifier_precision'] = model.precision
+    IMAGES_CLASSIFIED.inc(classified - cache_hits, source='model')
+    IMAGES_CLASSIFIED.inc(cache_hits, source='cache')
+    return summary
+
+def _summarize_classification(count_by_class, error_count=0, errors=None):
     total = sum(count_by_class.values())
     neg_count = count_by_class[0]
     pos_count = count_by_class[1]
@@ -61,9 +297,117 @@ def classify_images(input_folder):
         'negative_pct': f"{neg_pct:.2f}%",
         'positive_count': pos_count,
         'positive_pct': f"{pos_pct:.2f}%",
-        'final_classification': final_class
+        'final_classification': final_class,
+        'error_count': error_count,
+        'errors': errors or [],
     }
 
+def classify_images(input_folder, batch_size=None):
+    return _classify_stream(_iter_image_files(input_folder), batch_size=batch_size)
+
+def merge_classifications(first, second):
+    """Combine the summaries of two disjoint sets of images."""
+    count_by_class = {
+        0: first['negative_count'] + second['negative_count'],
+        1: first['positive_count'] + second['positive_count'],
+    }
+    errors = (first['errors'] + second['errors'])[:MAX_REPORTED_ERRORS]
+    summary = _summarize_classification(count_by_class, first['error_count'] + second['error_count'], errors)
+    cache_hits = first.get('cache_hits', 0) + second.get('cache_hits', 0)
+    summary['cache_hits'] = cache_hits
+    summary['cache_hit_ratio'] = round(cache_hits / summary['total_images'], 4) if summary['total_images'] else 0
+    summary['classifier_precision'] = second.get('classifier_precision', first.get('classifier_precision'))
+    return summary
+
+def proportion_interval(successes, n, population, z):
+    """Wilson score interval for a proportion seen in ``n`` of ``population`` items, with finite population correction."""
+    if n == 0:
+        return 0.0, 1.0
+    if population > 1:
+        z *= math.sqrt(max(population - n, 0) / (population - 1))
+    p = successes / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+def classify_zip_sampled(zip_path, confidence=None, min_samples=None, seed=None, batch_size=None, progress_callback=None):
+    """
+    Classify the images of ``zip_path`` in random order and stop as soon as the
+    majority class is settled: either the unseen images can no longer flip it,
+    or (after ``min_samples`` images) the confidence interval for the positive
+    share excludes 50%. The check runs after every batch, so ``confidence``
+    should be high to allow for repeated looks.
+
+    Returns ``(summary, remaining)`` where ``remaining`` lists the members that
+    were not classified. If any were skipped the summary is flagged ``sampled``
+    and its percentages are estimates with confidence intervals.
+    """
+    confidence = confidence or getattr(settings, 'CLASSIFY_EARLY_EXIT_CONFIDENCE', 0.999)
+    min_samples = min_samples or getattr(settings, 'CLASSIFY_EARLY_EXIT_MIN_SAMPLES', 64)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = image_members(zip_ref)
+        random.Random(seed).shuffle(members)
+        population = len(members)
+
+        def settled(count_by_class, error_count):
+            positive, negative = count_by_class[1], count_by_class[0]
+            unseen = population - positive - negative - error_count
+            if positive >= negative + unseen or negative > positive + unseen:
+                return True
+            if positive + negative < min_samples:
+                return False
+            low, high = proportion_interval(positive, positive + negative, population - error_count, z)
+            return low > 0.5 or high < 0.5
+
+        summary = _classify_stream(
+            _iter_zip_images(zip_ref, members),
+            batch_size=batch_size,
+            total=population,
+            progress_callback=progress_callback,
+            should_stop=settled,
+        )
+
+    classified = summary['total_images']
+    seen = classified + summary['error_count']
+    remaining = [info.filename for info in members[seen:]]
+    if remaining:
+        low, high = proportion_interval(summary['positive_count'], classified, population - summary['error_count'], z)
+        summary.update({
+            'sampled': True,
+            'population': population,
+            # Undecodable images are assumed to be as common in the rest of the archive.
+            'estimated_total_images': round(population * classified / seen) if seen else 0,
+            'confidence': confidence,
+            'positive_pct_ci': [f"{100 * low:.2f}%", f"{100 * high:.2f}%"],
+            'negative_pct_ci': [f"{100 * (1 - high):.2f}%", f"{100 * (1 - low):.2f}%"],
+        })
+        print(f"🎲 Majority settled after {classified}/{population} images: {summary['final_classification']}")
+    return summary, remaining
+
+def classify_zip(zip_path, batch_size=None, progress_callback=None, names=None, should_stop=None):
+    """
+    Classify the images inside ``zip_path`` without extracting it. Members are
+    read and decoded in memory a few at a time, so memory use does not grow
+    with the archive. Raises ``ArchiveRejected`` if the archive is over the
+    configured member count or uncompressed size limits. ``names`` restricts
+    classification to those members; ``should_stop`` is as in ``_classify_stream``.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = image_members(zip_ref)
+        if names is not None:
+            wanted = set(names)
+            members = [info for info in members if info.filename in wanted]
+        return _classify_stream(
+            _iter_zip_images(zip_ref, members),
+            batch_size=batch_size,
+            total=len(members),
+            progress_callback=progress_callback,
+            should_stop=should_stop,
+        )
+
 # === GAN Classes ===
 class WSLinear(nn.Module):
     def __init__(self, in_features, out_features):
@@ -124,13 +468,49 @@ class AdaIN(nn.Module):
         style_bias = self.style_bias(w).unsqueeze(2).unsqueeze(3)
         return style_scale * x + style_bias
 
+def image_seed(seed, index):
+    """Seed for image ``index`` of a seeded job; independent of batch size and sharding."""
+    return int.from_bytes(hashlib.blake2b(f'{seed}:{index}'.encode(), digest_size=8).digest(), 'little')
+
+def image_rngs(seed, first_index, count, device=None):
+    """One torch Generator per image, seeded by its index in the job."""
+    return [
+        torch.Generator(device=device or DEVICE).manual_seed(image_seed(seed, first_index + i))
+        for i in range(count)
+    ]
+
+def aligned_batches(first_index, count, batch_size):
+    """
+    ``(skip, size)`` for each chunk of ``batch_size`` consecutive image
+    indices, aligned to multiples of ``batch_size``, that covers images
+    ``first_index`` onwards: the chunk is generated whole and ``size`` images
+    after the first ``skip`` are kept.
+    """
+    batches = []
+    index, end = first_index, first_index + count
+    while index < end:
+        skip = index % batch_size
+        size = min(batch_size - skip, end - index)
+        batches.append((skip, size))
+        index += size
+    return batches
+
+def randn_batch(shape, rng=None, device=None):
+    """
+    ``torch.randn(shape)`` where ``rng`` is None, one Generator, or a list of
+    Generators with one per sample, each drawing that sample's slice.
+    """
+    if isinstance(rng, (list, tuple)):
+        return torch.cat([torch.randn((1,) + tuple(shape[1:]), generator=g, device=device) for g in rng])
+    return torch.randn(shape, generator=rng, device=device)
+
 class InjectNoise(nn.Module):
     def __init__(self, channels):
         super().__init__()
         self.weight = nn.Parameter(torch.zeros(1, channels, 1, 1))
 
-    def forward(self, x):
-        noise = torch.randn(x.shape[0], 1, x.shape[2], x.shape[3], device=x.device)
+    def forward(self, x, rng=None):
+        noise = randn_batch((x.shape[0], 1, x.shape[2], x.shape[3]), rng, device=x.device)
         return x + self.weight * noise
 
 class WSConv2d(nn.Module):
@@ -157,13 +537,13 @@ class GenBlock(nn.Module):
         self.adain1 = AdaIN(out_channels, w_dim)
         self.adain2 = AdaIN(out_channels, w_dim)
 
-    def forward(self, x, w):
+    def forward(self, x, w, rng=None):
         x = self.conv1(x)
-        x = self.inject_noise1(x)
+        x = self.inject_noise1(x, rng)
         x = self.leaky(x)
         x = self.adain1(x, w)
         x = self.conv2(x)
-        x = self.inject_noise2(x)
+        x = self.inject_noise2(x, rng)
         x = self.leaky(x)
         x = self.adain2(x, w)
         return x
@@ -201,7 +581,7 @@ class Generator(nn.Module):
             for i in range(len(rgb_channel_counts))
         ])
 
-    def forward(self, noise, alpha, steps):
+    def forward(self, noise, alpha, steps, rng=None):
         # Map noise to W space
         w = self.map(noise)
         
@@ -209,9 +589,9 @@ class Generator(nn.Module):
         x = self.starting_constant.repeat(noise.shape[0], 1, 1, 1)
         
         # Initial block (stem at 4x4)
-        x = self.initial_adain1(self.leaky(self.initial_noise1(x)), w)
+        x = self.initial_adain1(self.leaky(self.initial_noise1(x, rng)), w)
         x = self.initial_conv(x)
-        x = self.initial_adain2(self.leaky(self.initial_noise2(x)), w)
+        x = self.initial_adain2(self.leaky(self.initial_noise2(x, rng)), w)
         
         # Special case for 4x4 (unused, but kept for completeness)
         if steps == 0:
@@ -222,27 +602,95 @@ class Generator(nn.Module):
             # Upsample first (ensures steps upsamplings)
             x = torch.nn.functional.interpolate(x, scale_factor=2, mode='bilinear', align_corners=False)
             # Apply progressive block
-            x = self.prog_blocks[step](x, w)
+            x = self.prog_blocks[step](x, w, rng)
         
         # Convert to RGB at final resolution
         return self.rgb_layers[steps](x)
       
-def generate_images_with_gan(generator_path, output_dir, num_images=100, batch_size=10, steps=None):
+def load_generator(generator_path):
+    state_dict = load_weights(generator_path, map_location=DEVICE)
+    gen = Generator(Z_DIM, W_DIM, IN_CHANNELS, CHANNELS_IMG).to(DEVICE)
+    gen.load_state_dict(state_dict, strict=False, assign=True)
+    gen.eval()
+    return gen
+
+def load_inference_generator(generator_path, steps, precision='fp32'):
+    gen = load_generator(generator_path)
+    mode = getattr(settings, 'GAN_INFERENCE_EXPORT', 'eager')
+    if mode != 'off':
+        from .gan_export import export_generator
+        gen = export_generator(
+            gen, steps, mode=mode, verify=getattr(settings, 'GAN_EXPORT_VERIFY', True), weights_path=generator_path
+        )
+    return apply_generator_precision(gen, precision, steps, Z_DIM, DEVICE)
+
+def get_generator(generator_path, steps):
+    precision = getattr(settings, 'GAN_PRECISION', 'fp32')
+    return get_registry().get(
+        ('generator', generator_path, steps, precision),
+        generator_path,
+        lambda: load_inference_generator(generator_path, steps, precision),
+    )
+
+def _to_uint8_images(img):
+    """Denormalize a [-1, 1] NCHW batch to NHWC uint8 numpy arrays in one pass."""
+    return img.mul(0.5).add_(0.5).mul_(255).add_(0.5).clamp_(0, 255).permute(0, 2, 3, 1).to('cpu', torch.uint8).numpy()
+
+def _encode_png(array, compress_level, timings=None):
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format='PNG', compress_level=compress_level)
+    record_stage('png_encode', time.perf_counter() - start, timings)
+    return buffer.getvalue()
+
+def _encode_webp(array, method, timings=None):
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format='WEBP', lossless=True, method=method)
+    record_stage('webp_encode', time.perf_counter() - start, timings)
+    return buffer.getvalue()
+
+def make_contact_sheet(images, thumbnail_size=None, max_images=None):
+    """PNG bytes of a grid of thumbnails of the first ``max_images`` uint8 HWC arrays."""
+    thumbnail_size = thumbnail_size or getattr(settings, 'PREVIEW_THUMBNAIL_SIZE', 96)
+    max_images = max_images or getattr(settings, 'PREVIEW_MAX_IMAGES', 16)
+    images = list(images[:max_images])
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    sheet = Image.new('RGB', (columns * thumbnail_size, rows * thumbnail_size), (255, 255, 255))
+    for i, array in enumerate(images):
+        thumbnail = Image.fromarray(array).resize((thumbnail_size, thumbnail_size), Image.BILINEAR)
+        sheet.paste(thumbnail, ((i % columns) * thumbnail_size, (i // columns) * thumbnail_size))
+    buffer = io.BytesIO()
+    sheet.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def generate_images_with_gan(generator_path, output, num_images=100, batch_size=None, steps=None, progress_callback=None, seed=None, first_index=0, preview_callback=None):
+    """
+    Generate ``num_images`` images with the generator at ``generator_path``.
+    ``output`` is either a directory path or an ``OutputSink``; the sink
+    decides whether images land in a directory or straight in an archive,
+    and whether they are encoded as PNG, lossless WebP or kept as arrays.
+
+    Encoding runs on a thread pool so it overlaps the next batch's forward
+    pass; encoded images are handed to the sink in order on this thread.
+    Passing ``seed`` makes the output reproducible: each image's noise comes
+    from its own generator seeded by (seed, image index), and images are
+    generated in fixed chunks of GAN_SEEDED_BATCH_SIZE indices, so they do not
+    depend on ``batch_size`` or on how a job is sharded. Otherwise the batch
+    size is ``batch_size``, GAN_BATCH_SIZE or autotuned per (generator, steps).
+    Images are numbered from ``first_index`` so shards can write disjoint names.
+    ``preview_callback`` receives a PNG contact sheet of the first batch as
+    soon as it is generated.
+    """
+    sink = DirectorySink(output) if isinstance(output, (str, os.PathLike)) else output
+    image_format = getattr(sink, 'image_format', 'png')
+    if image_format == 'webp':
+        encode, encode_arg = _encode_webp, getattr(settings, 'GAN_WEBP_METHOD', 2)
+    else:
+        encode, encode_arg = _encode_png, getattr(settings, 'GAN_PNG_COMPRESS_LEVEL', 6)
+    encode_workers = getattr(settings, 'GAN_ENCODE_WORKERS', None) or min(4, os.cpu_count() or 1)
     try:
-        print(f"🔍 Loading generator from: {generator_path}")
-        
-        # Load the state dict
-        state_dict = torch.load(generator_path, map_location=DEVICE)
-        
-        # Create generator
-        gen = Generator(Z_DIM, W_DIM, IN_CHANNELS, CHANNELS_IMG).to(DEVICE)
-        
-        # Load the state dict
-        gen.load_state_dict(state_dict, strict=False)
-        gen.eval()
-
-        print(f"✅ Generator loaded successfully")
-        
         # Use provided steps
         if steps is not None:
             print(f"🎯 Using provided steps={steps}")
@@ -255,60 +703,95 @@ def generate_images_with_gan(generator_path, output_dir, num_images=100, batch_s
             else:
                 steps = 6
             print(f"🎯 Auto-selected steps={steps} based on model name")
+
+        print(f"🔍 Loading generator from: {generator_path}")
+        gen = get_generator(generator_path, steps)
+        print(f"✅ Generator loaded successfully")
         
         # Corrected resolution calculation
         resolution = 4 * (2 ** steps)
         print(f"📐 Target resolution: {resolution}x{resolution}")
         print(f"📊 Generating {num_images} images")
 
-        # Adjust batch size if needed
-        if num_images < batch_size:
-            batch_size = num_images
+        if seed is not None:
+            # Results can shift by a rounding step with the batch size and position, so seeded jobs
+            # always generate the same whole chunks of image indices, however the job is split.
+            batch_size = getattr(settings, 'GAN_SEEDED_BATCH_SIZE', 16)
+            batches = aligned_batches(first_index, num_images, batch_size)
+        else:
+            if not batch_size:
+                batch_size = getattr(settings, 'GAN_BATCH_SIZE', 0) or get_batch_size_tuner().batch_size_for(
+                    (generator_path, steps), gen, steps, Z_DIM, DEVICE
+                )
+
+            # Adjust batch size if needed
+            if num_images < batch_size:
+                batch_size = num_images
 
-        num_batches = num_images // batch_size
-        remaining = num_images % batch_size
+            num_batches = num_images // batch_size
+            remaining = num_images % batch_size
+            batches = [(0, size) for size in [batch_size] * num_batches + ([remaining] if remaining else [])]
+        print(f"📦 Batch size {batch_size}")
 
         generated_count = 0
-        
-        with torch.no_grad():
-            for i in range(num_batches):
-                noise = torch.randn(batch_size, Z_DIM).to(DEVICE)
-                print(f"🔄 Generating batch {i+1}/{num_batches} (steps={steps}, res={resolution})...")
+        written_count = 0
+        pending = deque()
+        max_pending = 2 * batch_size
+        timings = current_timings()
+
+        def drain(limit):
+            nonlocal written_count
+            while len(pending) > limit:
+                name, future = pending.popleft()
+                data = future.result()
+                with timed('sink_write'):
+                    sink.write(name, data)
+                written_count += 1
+            if progress_callback is not None:
+                progress_callback(written_count, num_images)
+
+        with torch.no_grad(), ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix='encode') as pool:
+            for i, (skip, size) in enumerate(batches):
+                if seed is not None:
+                    rng = image_rngs(seed, first_index + generated_count - skip, batch_size)
+                    noise = randn_batch((batch_size, Z_DIM), rng, device=DEVICE)
+                else:
+                    rng = None
+                    noise = torch.randn(size, Z_DIM, device=DEVICE)
+                print(f"🔄 Generating batch {i+1}/{len(batches)} (steps={steps}, res={resolution})...")
                 
-                img = gen(noise, alpha=1, steps=steps)
+                with timed('generate_forward'):
+                    img = gen(noise, alpha=1, steps=steps, rng=rng)[skip:skip + size]
                 print(f"✅ Generated batch {i+1}, shape: {img.shape}")  # Should be [batch, 3, res, res]
-                
-                for j, single_img in enumerate(img):
-                    # Denormalize from [-1, 1] to [0, 1] and save
-                    normalized_img = single_img * 0.5 + 0.5
-                    save_image(normalized_img, 
-                              os.path.join(output_dir, f'generated_{generated_count}.png'))
-                    generated_count += 1
 
-                # Debug: Save first image of first batch as sample (for manual inspection)
-                if i == 0 and generated_count > 0:
-                    sample_path = os.path.join(output_dir, 'debug_sample.png')
-                    save_image(normalized_img[0], sample_path)  # First image
-                    print(f"🧪 Debug sample saved: {sample_path}")
-
-            if remaining > 0:
-                noise = torch.randn(remaining, Z_DIM).to(DEVICE)
-                img = gen(noise, alpha=1, steps=steps)
-                for j, single_img in enumerate(img):
-                    normalized_img = single_img * 0.5 + 0.5
-                    save_image(normalized_img, 
-                              os.path.join(output_dir, f'generated_{generated_count}.png'))
+                # Denormalize from [-1, 1] to uint8 for the whole batch, then encode in the background
+                with timed('to_uint8'):
+                    images = _to_uint8_images(img)
+                for array in images:
+                    if image_format == 'array':
+                        name = f'generated_{first_index + generated_count}'
+                        future = Future()
+                        future.set_result(array)
+                    else:
+                        name = f'generated_{first_index + generated_count}.{image_format}'
+                        future = pool.submit(encode, array, encode_arg, timings)
+                    pending.append((name, future))
                     generated_count += 1
+
+                # Let users look at the first batch while the rest is generated
+                if i == 0 and preview_callback is not None:
+                    with timed('preview'):
+                        preview_callback(make_contact_sheet(images))
+                    print(f"🖼️ Preview of first batch ready")
+
+                # Write out everything but the most recent batches while the next forward pass runs
+                drain(max_pending)
+
+            drain(0)
                     
-        print(f"🎉 Successfully generated {generated_count} images in {output_dir}")
-        print(f"📁 Output directory: {output_dir}")
+        print(f"🎉 Successfully generated {generated_count} images")
+        return generated_count
                     
     except Exception as e:
         print(f"❌ Error in generate_images_with_gan: {e}")
         raise
-    
-
-
-
-
-    
\ No newline at end of file
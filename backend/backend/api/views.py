@@ -1,38 +1,282 @@
 import os
-import zipfile
-import shutil
-import uuid
+import re
+from datetime import datetime
+from urllib.parse import urlencode
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 import rest_framework
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from urllib.parse import urljoin
 
-from .utils import classify_images, generate_images_with_gan
-from .models import Process
+from .instrumentation import render_metrics
+from .jobs import enqueue
+from .models import Process, UploadSession
+from .uploads import (
+    OffsetMismatch,
+    UploadError,
+    discard_session,
+    finalize_upload,
+    prune_upload_sessions,
+    receive_chunk,
+    store_upload,
+)
+
+def _process_options(data):
+    """Multiplier, seed, fast_decision and output_format from request data; raises ValueError if malformed."""
+    seed = data.get('seed')
+    fast_decision = data.get('fast_decision')
+    if fast_decision in (None, ''):
+        fast_decision = getattr(settings, 'CLASSIFY_FAST_DECISION', False)
+    else:
+        fast_decision = str(fast_decision).lower() in ('1', 'true', 'yes', 'on')
+    output_format = data.get('output_format') or 'zip'
+    if output_format not in dict(Process.OUTPUT_FORMAT_CHOICES):
+        raise ValueError(f"Unknown output format {output_format!r}")
+    return {
+        'multiplier': int(data['multiplier']),
+        'seed': int(seed) if seed not in (None, '') else None,
+        'fast_decision': fast_decision,
+        'output_format': output_format,
+    }
+
+def _stored_upload(content_hash):
+    """Storage name of an identical upload that is still on disk, if any."""
+    if not content_hash:
+        return None
+    existing = Process.objects.filter(content_hash=content_hash).order_by('-id').first()
+    if existing and os.path.exists(os.path.join(settings.MEDIA_ROOT, existing.original_file.name)):
+        return existing.original_file.name
+    return None
+
+def _media_url(request, name, kind, expired):
+    """Absolute URL of a stored file, or None if there is none or retention deleted it."""
+    if not name or kind in expired:
+        return None
+    return request.build_absolute_uri(settings.MEDIA_URL + name)
+
+def _process_etag(pk, updated_at):
+    return f'"{pk}-{updated_at.timestamp():.6f}"'
+
+def _set_validators(response, pk, updated_at):
+    response['ETag'] = _process_etag(pk, updated_at)
+    # Let browsers keep the body but revalidate on every poll.
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+PROCESS_LIST_FIELDS = (
+    'id', 'state', 'progress', 'output_format', 'gan_used', 'error',
+    'processed_file', 'expired_artifacts', 'created_at', 'finished_at',
+)
+
+def _encode_cursor(created_at, pk):
+    return urlsafe_base64_encode(f'{created_at.isoformat()}|{pk}'.encode())
+
+def _decode_cursor(cursor):
+    """(created_at, id) of the last row on the previous page; raises ValueError if malformed."""
+    created_at, pk = urlsafe_base64_decode(cursor).decode().split('|')
+    created_at = datetime.fromisoformat(created_at)
+    if timezone.is_naive(created_at):
+        raise ValueError('Cursor time has no timezone')
+    return created_at, int(pk)
 
 class ProcessCreateView(APIView):
+    def get(self, request):
+        """
+        Processes newest first, ``limit`` per page. ``next`` carries a cursor
+        for the following page, which is read with a range scan on the
+        (created_at, id) index rather than an OFFSET.
+        """
+        default = getattr(settings, 'PROCESS_LIST_PAGE_SIZE', 50)
+        try:
+            limit = int(request.query_params.get('limit') or default)
+            if limit < 1:
+                raise ValueError(limit)
+            limit = min(limit, getattr(settings, 'PROCESS_LIST_MAX_PAGE_SIZE', 200))
+            rows = Process.objects.order_by('-created_at', '-id')
+            cursor = request.query_params.get('cursor')
+            if cursor:
+                created_at, last_id = _decode_cursor(cursor)
+                rows = rows.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=last_id)
+        except ValueError:
+            return Response({'error': 'Invalid limit or cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = list(rows.values(*PROCESS_LIST_FIELDS)[:limit + 1])
+        next_url = None
+        if len(page) > limit:
+            page = page[:limit]
+            query = urlencode({'limit': limit, 'cursor': _encode_cursor(page[-1]['created_at'], page[-1]['id'])})
+            next_url = request.build_absolute_uri(f"{reverse('process_create')}?{query}")
+
+        results = []
+        for row in page:
+            expired = row['expired_artifacts'] or {}
+            results.append({
+                'id': row['id'],
+                'state': row['state'],
+                'progress': row['progress'],
+                'output_format': row['output_format'],
+                'gan_used': row['gan_used'],
+                'error': row['error'],
+                'processed_file': _media_url(request, row['processed_file'], 'output', expired),
+                'expired': expired,
+                'created_at': row['created_at'],
+                'finished_at': row['finished_at'],
+                'status_url': request.build_absolute_uri(reverse('process_retrieve', args=[row['id']])),
+            })
+        return Response({'results': results, 'next': next_url})
+
     def post(self, request):
         if 'original_file' not in request.FILES or 'multiplier' not in request.data:
             return Response({'error': 'Missing zip file or multiplier'}, status=status.HTTP_400_BAD_REQUEST)
 
         zip_file = request.FILES['original_file']
-        multiplier = int(request.data['multiplier'])
+        try:
+            options = _process_options(request.data)
+        except ValueError:
+            return Response({'error': 'Invalid multiplier, seed or output format'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Validate file extension
         if not zip_file.name.endswith('.zip'):
             return Response({'error': 'Only ZIP files are supported'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Hash computed by HashingUploadHandler while the upload was streamed in
+        content_hash = getattr(request, 'upload_sha256', {}).get('original_file')
+
+        # Reuse the stored copy of an identical upload instead of saving another one
+        existing = _stored_upload(content_hash)
+
         # Save process instance
         process = Process.objects.create(
-            original_file=zip_file,
-            multiplier=multiplier
+            original_file=existing or zip_file,
+            content_hash=content_hash,
+            **options,
         )
 
         return Response({'id': process.id}, status=status.HTTP_201_CREATED)
 
+class UploadSessionCreateView(APIView):
+    """Start a chunked upload: ``filename`` (a .zip) and optionally its total ``size`` in bytes."""
+
+    def post(self, request):
+        filename = os.path.basename(str(request.data.get('filename') or ''))
+        if not filename.endswith('.zip'):
+            return Response({'error': 'Only ZIP files are supported'}, status=status.HTTP_400_BAD_REQUEST)
+        size = request.data.get('size')
+        try:
+            size = int(size) if size not in (None, '') else None
+        except ValueError:
+            return Response({'error': 'Invalid size'}, status=status.HTTP_400_BAD_REQUEST)
+        max_bytes = getattr(settings, 'UPLOAD_MAX_BYTES', 4 * 2**30)
+        if size is not None and not 0 < size <= max_bytes:
+            return Response({'error': f'Size must be between 1 and {max_bytes} bytes'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        prune_upload_sessions()
+        session = UploadSession.objects.create(filename=filename, size=size)
+        return Response({
+            'id': str(session.pk),
+            'offset': 0,
+            'chunk_size': getattr(settings, 'UPLOAD_CHUNK_MAX_BYTES', 16 * 2**20),
+            'upload_url': request.build_absolute_uri(reverse('upload_session', args=[session.pk])),
+        }, status=status.HTTP_201_CREATED)
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+class UploadSessionView(APIView):
+    """
+    GET reports how many bytes have been received (where to resume).
+    PUT appends a chunk sent as the raw request body with
+    ``Content-Range: bytes <first>-<last>/<total or *>``; the total must match
+    the size given when the upload started, and the body must be exactly the
+    range. DELETE abandons the upload.
+    """
+
+    def _session(self, pk):
+        try:
+            return UploadSession.objects.get(pk=pk)
+        except UploadSession.DoesNotExist:
+            return None
+
+    def _status(self, session):
+        return {'id': str(session.pk), 'filename': session.filename, 'size': session.size, 'offset': session.received_bytes}
+
+    def get(self, request, pk):
+        session = self._session(pk)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._status(session))
+
+    def put(self, request, pk):
+        session = self._session(pk)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        match = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+        if not match:
+            return Response({'error': 'Missing or invalid Content-Range header'}, status=status.HTTP_400_BAD_REQUEST)
+        first, last, total = int(match.group(1)), int(match.group(2)), match.group(3)
+        length = last - first + 1
+        if total != '*' and session.size is not None and int(total) != session.size:
+            return Response({'error': f'Content-Range total {total} does not match the upload size {session.size}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        body_length = request.META.get('CONTENT_LENGTH')
+        if body_length not in (None, '') and int(body_length) != length:
+            return Response({'error': f'Body is {body_length} bytes but Content-Range covers {length}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            receive_chunk(session, first, length, request.stream)
+        except OffsetMismatch as e:
+            return Response({'error': str(e), 'offset': e.expected}, status=status.HTTP_409_CONFLICT)
+        except UploadError as e:
+            return Response({'error': str(e), 'offset': session.received_bytes}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self._status(session))
+
+    def delete(self, request, pk):
+        session = self._session(pk)
+        if session is not None:
+            discard_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class UploadFinalizeView(APIView):
+    """
+    Validate a completed chunked upload and create its Process (same options
+    as ProcessCreateView). An optional ``sha256`` of the whole file is checked
+    against what was received.
+    """
+
+    def post(self, request, pk):
+        try:
+            session = UploadSession.objects.get(pk=pk)
+        except UploadSession.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        if 'multiplier' not in request.data:
+            return Response({'error': 'Missing multiplier'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            options = _process_options(request.data)
+        except ValueError:
+            return Response({'error': 'Invalid multiplier, seed or output format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            path, content_hash, image_count = finalize_upload(session, request.data.get('sha256') or None)
+        except UploadError as e:
+            return Response({'error': str(e), 'offset': session.received_bytes}, status=status.HTTP_400_BAD_REQUEST)
+
+        existing = _stored_upload(content_hash)
+        if existing:
+            os.remove(path)
+        process = Process.objects.create(
+            original_file=existing or store_upload(path, session.filename),
+            content_hash=content_hash,
+            **options,
+        )
+        session.delete()
+        return Response({'id': process.id, 'images': image_count}, status=status.HTTP_201_CREATED)
+
 class ProcessDataView(APIView):
     def post(self, request, pk):
         try:
@@ -40,112 +284,82 @@ class ProcessDataView(APIView):
         except Process.DoesNotExist:
             return Response({'error': 'Process not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        zip_path = os.path.join(settings.MEDIA_ROOT, process.original_file.name)
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp', str(uuid.uuid4()))
-        os.makedirs(temp_dir, exist_ok=True)
+        if 'upload' in (process.expired_artifacts or {}):
+            return Response({'error': 'The uploaded file has expired; upload it again'}, status=status.HTTP_410_GONE)
+        if process.state not in Process.ACTIVE_STATES:
+            enqueue(process)
+
+        return Response({
+            'id': process.id,
+            'state': process.state,
+            'status_url': request.build_absolute_uri(reverse('process_retrieve', args=[process.id])),
+        }, status=status.HTTP_202_ACCEPTED)
 
+class ProcessCancelView(APIView):
+    """Stop a queued job at once, or ask a running one to stop at its next progress update."""
+
+    def post(self, request, pk):
         try:
-            # Unzip
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            # Classify images
-            classification_result = classify_images(temp_dir)
-
-            # Check if images were found
-            total = classification_result['total_images']
-            if total == 0:
-                print(f"No valid images found in {temp_dir}")
-                return Response({'error': 'No valid images found'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Extract counts
-            pos_count = classification_result['positive_count']
-            neg_count = classification_result['negative_count']
-
-            # Decide GAN based on counts
-            if pos_count >= neg_count:
-                gan_type = 'positive'
-                generator_path = os.path.join(settings.BASE_DIR, 'models', 'generator_positive_256.pth')
-                # Use steps=6 for positive GAN (this gives perfect circular shapes)
-                steps = 6
-                resolution = "256x256"
-            else:
-                gan_type = 'negative'
-                generator_path = os.path.join(settings.BASE_DIR, 'models', 'generator_negative_128.pth')
-                # Use steps=5 for negative GAN
-                steps = 5
-                resolution = "128x128"
-
-            # Generate images
-            output_dir = os.path.join(settings.MEDIA_ROOT, 'generated', str(uuid.uuid4()))
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Calculate number of images to generate based on multiplier
-            num_images = total * process.multiplier
-            
-            print(f"🚀 Starting generation with {gan_type} GAN...")
-            print(f"📊 Generating {num_images} images (original: {total} × multiplier: {process.multiplier})")
-            print(f"🎯 Using steps={steps} for {resolution} resolution")
-            
-            # Pass steps parameter to the generation function
-            generate_images_with_gan(generator_path, output_dir, num_images=num_images, steps=steps)
-
-            # Zip generated images
-            generated_zip_path = os.path.join(settings.MEDIA_ROOT, 'generated_zips', f'{gan_type}_generated_{pk}.zip')
-            os.makedirs(os.path.dirname(generated_zip_path), exist_ok=True)
-            shutil.make_archive(generated_zip_path.replace('.zip', ''), 'zip', root_dir=output_dir)
-
-            if os.path.exists(generated_zip_path):
-                zip_file_size = os.path.getsize(generated_zip_path)
-                print(f"✅ Created ZIP file: {generated_zip_path} ({zip_file_size} bytes)")
-    
-                # Verify it has content
-                with zipfile.ZipFile(generated_zip_path, 'r') as zip_ref:
-                    file_list = zip_ref.namelist()
-                    print(f"📁 ZIP contains {len(file_list)} files")
-            else:
-                print(f"❌ Failed to create ZIP file: {generated_zip_path}")
-
-            # Update process
-            process.classification_summary = classification_result
-            process.gan_used = f"{gan_type} (steps={steps}, {resolution})"
-            process.processed_file = generated_zip_path.replace(settings.MEDIA_ROOT + '/', '')
-            process.save()
-
-            return Response({'message': 'Processing complete'}, status=status.HTTP_200_OK)
-
-        except Exception as e:
-            print(f"Error in ProcessDataView: {e}")
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        finally:
-            # Cleanup
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            # if os.path.exists(zip_path):
-            #     os.remove(zip_path)
-           
+            process = Process.objects.get(pk=pk)
+        except Process.DoesNotExist:
+            return Response({'error': 'Process not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        now = timezone.now()
+        if Process.objects.filter(pk=pk, state=Process.STATE_QUEUED).update(
+            state=Process.STATE_FAILED, error='Cancelled by user', finished_at=now, updated_at=now
+        ):
+            return Response({'id': process.id, 'state': Process.STATE_FAILED}, status=status.HTTP_200_OK)
+        if Process.objects.filter(pk=pk, state__in=Process.RUNNING_STATES).update(cancel_requested=True, updated_at=now):
+            return Response({'id': process.id, 'state': process.state, 'cancel_requested': True},
+                            status=status.HTTP_202_ACCEPTED)
+        return Response({'error': f'Process is {process.state}'}, status=status.HTTP_409_CONFLICT)
+
 class ProcessRetrieveView(APIView):
+    """
+    Job status. Every change to the row bumps ``updated_at``, which gives the
+    ETag: a poll with a matching If-None-Match is answered 304 after reading
+    only that column. There is no Last-Modified, since HTTP dates have whole
+    seconds and would hide updates made within the same second.
+    """
+
     def get(self, request, pk):
+        updated_at = Process.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return Response({'error': 'Process not found'}, status=404)
+        not_modified = get_conditional_response(request, etag=_process_etag(pk, updated_at))
+        if not_modified is not None:
+            return _set_validators(not_modified, pk, updated_at)
+
         try:
             process = Process.objects.get(pk=pk)
         except Process.DoesNotExist:
             return Response({'error': 'Process not found'}, status=404)
 
-        processed_file_url = None
-        if process.processed_file:
-            # Build absolute URL to the file
-            processed_file_url = request.build_absolute_uri(
-                settings.MEDIA_URL + process.processed_file.name
-            )
-
+        # Retention may have deleted files the row still names; report those as expired.
+        expired = process.expired_artifacts or {}
         response = {
             'id': process.id,
-            'processed_file': processed_file_url,
+            'state': process.state,
+            'progress': process.progress,
+            'images_classified': process.images_classified,
+            'images_generated': process.images_generated,
+            'error': process.error,
+            'processed_file': _media_url(request, process.processed_file.name, 'output', expired),
+            'output_format': process.output_format,
+            'preview': _media_url(request, process.preview_file.name, 'preview', expired),
+            'expired': expired,
             'classification_summary': process.classification_summary,
             'gan_used': process.gan_used,
+            'timings': process.timings,
         }
-        return Response(response, status=200)
+        return _set_validators(Response(response, status=200), pk, process.updated_at)
     
+class MetricsView(APIView):
+    """Prometheus scrape endpoint. Values are per worker process."""
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 class ModelInspectView(APIView):
     renderer_classes = [rest_framework.renderers.JSONRenderer]  # Add this line
     
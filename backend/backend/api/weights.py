@@ -0,0 +1,87 @@
+"""
+Weights-only, memory-mapped model loading.
+
+Checkpoints are converted once into a plain state-dict file under
+MODEL_WEIGHTS_DIR and loaded from there with ``torch.load(mmap=True)``.
+Tensors loaded that way are backed by the page cache instead of each
+process's heap, so every worker that maps the same file shares one copy.
+Modules keep those tensors only if they take them with
+``load_state_dict(..., assign=True)`` and never write to them in place.
+"""
+import glob
+import hashlib
+import os
+
+import torch
+from django.conf import settings
+
+from .model_registry import weights_fingerprint
+
+
+def mmap_enabled():
+    return getattr(settings, 'MODEL_MMAP_WEIGHTS', True)
+
+
+def converted_path(checkpoint_path, variant='weights'):
+    """
+    Where the converted copy of ``checkpoint_path`` lives; it changes whenever
+    the checkpoint is replaced. Each checkpoint directory gets its own
+    subdirectory, so checkouts sharing the cache don't replace each other's files.
+    """
+    source = hashlib.sha256(os.path.dirname(os.path.abspath(checkpoint_path)).encode()).hexdigest()[:12]
+    directory = os.path.join(settings.MODEL_WEIGHTS_DIR, source)
+    name = os.path.splitext(os.path.basename(checkpoint_path))[0]
+    return os.path.join(directory, f'{name}.{variant}.{weights_fingerprint(checkpoint_path)}.pt')
+
+
+def _save_atomic(state_dict, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Copies from older versions of the checkpoint are no longer used.
+    base = os.path.basename(path).rsplit('.', 2)[0]
+    for stale in glob.glob(os.path.join(os.path.dirname(path), f'{glob.escape(base)}.*.pt')):
+        if stale != path:
+            os.remove(stale)
+    # Compact, contiguous tensors so the file maps only what the module uses.
+    torch.save({key: value.detach().contiguous().clone() for key, value in state_dict.items()}, f'{path}.{os.getpid()}.tmp')
+    os.replace(f'{path}.{os.getpid()}.tmp', path)
+
+
+def load_weights(checkpoint_path, map_location='cpu'):
+    """
+    State dict of ``checkpoint_path``. With MODEL_MMAP_WEIGHTS its tensors
+    are memory-mapped from a converted copy, written on first use; if that
+    copy can't be written the checkpoint is read into memory as before.
+    """
+    if not mmap_enabled():
+        return torch.load(checkpoint_path, map_location=map_location, weights_only=True)
+    path = converted_path(checkpoint_path)
+    if not os.path.exists(path):
+        state_dict = torch.load(checkpoint_path, map_location='cpu', weights_only=True)
+        try:
+            _save_atomic(state_dict, path)
+        except OSError as e:
+            print(f"⚠️ Could not write memory-mappable weights to {path}: {e}")
+            return state_dict
+        print(f"🗜️ Converted {os.path.basename(checkpoint_path)} to memory-mappable weights")
+    return torch.load(path, map_location=map_location, mmap=True, weights_only=True)
+
+
+def share_module_weights(module, checkpoint_path, variant):
+    """
+    Replace ``module``'s parameters and buffers with memory-mapped copies
+    saved under ``variant`` for ``checkpoint_path``. For weights computed at
+    load time (folded generator layers) that would otherwise be private to
+    each worker. Returns ``module``.
+    """
+    if not mmap_enabled():
+        return module
+    path = converted_path(checkpoint_path, variant)
+    try:
+        if not os.path.exists(path):
+            _save_atomic(module.state_dict(), path)
+        device = next(module.parameters()).device
+        module.load_state_dict(torch.load(path, map_location=device, mmap=True, weights_only=True), assign=True)
+    except (OSError, RuntimeError) as e:
+        print(f"⚠️ Keeping private weights for {os.path.basename(checkpoint_path)} ({variant}): {e}")
+    return module
+
@@ -148,3 +148,150 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Model registry: loaded classifier/generators stay resident per worker process.
+# Least recently used models are evicted once their combined size exceeds this budget (0 = unlimited).
+MODEL_REGISTRY_MEMORY_BUDGET_MB = int(os.environ.get('MODEL_REGISTRY_MEMORY_BUDGET_MB', 2048))
+
+# Weights loading: with MODEL_MMAP_WEIGHTS each checkpoint (and each generator's folded inference
+# weights) is converted once into a weights-only file in MODEL_WEIGHTS_DIR (default: a user cache
+# directory, outside the source tree and MEDIA_ROOT) and memory-mapped from there, so worker processes
+# share one copy through the page cache. `manage.py benchmark --only memory` compares memory per worker.
+MODEL_MMAP_WEIGHTS = os.environ.get('MODEL_MMAP_WEIGHTS', '1') == '1'
+MODEL_WEIGHTS_DIR = os.environ.get('MODEL_WEIGHTS_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'sicklecell', 'model_weights'
+)
+
+# Startup warmup: torch and the models are imported on first use. With MODEL_WARMUP=1, serving
+# processes (WSGI/ASGI servers, runserver, run_job_workers) load every model and run one forward
+# pass each at startup instead, and print how long the import and warmup took.
+MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '0') == '1'
+
+# Classification pipeline: images are decoded on a thread pool and classified in stacked batches.
+CLASSIFIER_BATCH_SIZE = int(os.environ.get('CLASSIFIER_BATCH_SIZE', 32))
+CLASSIFIER_DECODE_WORKERS = int(os.environ.get('CLASSIFIER_DECODE_WORKERS', 0)) or None
+
+# Shared classifier: jobs in one process send their batches to a single scheduler thread that joins
+# them into forward passes of up to CLASSIFIER_SERVER_MAX_BATCH_SIZE images, waiting at most
+# CLASSIFIER_SERVER_MAX_WAIT_MS for other running jobs' batches. Set CLASSIFIER_INFERENCE_SERVER=0
+# to have each job run its own forward passes.
+CLASSIFIER_INFERENCE_SERVER = os.environ.get('CLASSIFIER_INFERENCE_SERVER', '1') == '1'
+CLASSIFIER_SERVER_MAX_BATCH_SIZE = int(os.environ.get('CLASSIFIER_SERVER_MAX_BATCH_SIZE', 64))
+CLASSIFIER_SERVER_MAX_WAIT_MS = float(os.environ.get('CLASSIFIER_SERVER_MAX_WAIT_MS', 10))
+
+# Guards applied to uploaded archives before any member is decoded.
+UPLOAD_MAX_IMAGE_MEMBERS = int(os.environ.get('UPLOAD_MAX_IMAGE_MEMBERS', 100000))
+UPLOAD_MAX_UNCOMPRESSED_BYTES = int(os.environ.get('UPLOAD_MAX_UNCOMPRESSED_BYTES', 4 * 1024 ** 3))
+UPLOAD_MAX_MEMBER_BYTES = int(os.environ.get('UPLOAD_MAX_MEMBER_BYTES', 64 * 1024 ** 2))
+
+# Background jobs: process_data queues work in the database and returns 202.
+# Web processes run JOB_WORKER_CONCURRENCY worker threads unless JOB_WORKERS_IN_PROCESS is off,
+# in which case jobs are picked up by `manage.py run_job_workers`. The threads start with the first
+# queued job, or when the server starts with JOB_WORKERS_START_ON_READY=1 (picks up jobs queued
+# before a restart; only set it for server processes, since every process that sets up Django with
+# it on runs workers).
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 1))
+JOB_WORKERS_IN_PROCESS = os.environ.get('JOB_WORKERS_IN_PROCESS', '1') == '1'
+JOB_WORKERS_START_ON_READY = os.environ.get('JOB_WORKERS_START_ON_READY', '0') == '1'
+JOB_TORCH_THREADS = int(os.environ.get('JOB_TORCH_THREADS', 0)) or None
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2.0))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 1800))
+
+# GAN output encoding: PNGs are encoded on a thread pool while the next batch is generated.
+# Lower compression levels (0-9) encode much faster at the cost of larger files.
+GAN_PNG_COMPRESS_LEVEL = int(os.environ.get('GAN_PNG_COMPRESS_LEVEL', 6))
+GAN_ENCODE_WORKERS = int(os.environ.get('GAN_ENCODE_WORKERS', 0)) or None
+
+# Uploads are hashed (SHA-256) while they stream in so identical datasets can be recognised.
+FILE_UPLOAD_HANDLERS = [
+    'api.uploads.HashingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Result cache: finished jobs are reused for the same (upload hash, multiplier, model weights, seed).
+RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', '1') == '1'
+RESULT_CACHE_MAX_AGE_SECONDS = int(os.environ.get('RESULT_CACHE_MAX_AGE_SECONDS', 7 * 24 * 3600))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 10 * 1024 ** 3))
+
+# Per-image prediction cache: classifier outputs are stored by image digest and reused across uploads.
+IMAGE_PREDICTION_CACHE_ENABLED = os.environ.get('IMAGE_PREDICTION_CACHE_ENABLED', '1') == '1'
+
+# Generators are exported per steps value to an inference-only module (folded scales, one style matmul).
+# 'off' keeps the training module, 'eager' runs the export as-is, 'jit' scripts it, 'compile' uses torch.compile.
+# With GAN_EXPORT_VERIFY the export is checked against the original module when loaded.
+GAN_INFERENCE_EXPORT = os.environ.get('GAN_INFERENCE_EXPORT', 'eager')
+GAN_EXPORT_VERIFY = os.environ.get('GAN_EXPORT_VERIFY', '1') == '1'
+
+# GAN batch size: a fixed GAN_BATCH_SIZE, or 0 to autotune per (generator, steps) on first use.
+# Autotuning keeps a batch's peak memory under GAN_MEMORY_CEILING_MB (0 = half of available memory).
+GAN_BATCH_SIZE = int(os.environ.get('GAN_BATCH_SIZE', 0))
+GAN_MEMORY_CEILING_MB = int(os.environ.get('GAN_MEMORY_CEILING_MB', 0))
+GAN_MAX_BATCH_SIZE = int(os.environ.get('GAN_MAX_BATCH_SIZE', 256))
+# Seeded jobs always run batches of GAN_SEEDED_BATCH_SIZE aligned image indices instead, so the
+# same seed gives the same images whatever the autotuned batch size or the number of shards.
+GAN_SEEDED_BATCH_SIZE = int(os.environ.get('GAN_SEEDED_BATCH_SIZE', 16))
+
+# Sharded generation: jobs with at least GAN_SHARD_MIN_IMAGES images are split across
+# GAN_SHARD_WORKERS processes (0 or 1 disables), each with GAN_SHARD_THREADS torch threads
+# (0 = cores divided evenly between workers).
+GAN_SHARD_WORKERS = int(os.environ.get('GAN_SHARD_WORKERS', 0))
+GAN_SHARD_THREADS = int(os.environ.get('GAN_SHARD_THREADS', 0))
+GAN_SHARD_MIN_IMAGES = int(os.environ.get('GAN_SHARD_MIN_IMAGES', 2000))
+
+# Inference precision: CLASSIFIER_PRECISION is fp32, bf16 or int8; GAN_PRECISION is fp32 or bf16.
+# A lower precision is only enabled if it matches fp32: classifier modes need real cell images in
+# PRECISION_CALIBRATION_DIR (at least 16; half calibrate int8, the other half are held out) and must
+# agree with PRECISION_MIN_AGREEMENT of fp32 predictions on the held-out half. Generator pixel
+# statistics must stay within PRECISION_MAX_PIXEL_ERROR.
+CLASSIFIER_PRECISION = os.environ.get('CLASSIFIER_PRECISION', 'fp32')
+GAN_PRECISION = os.environ.get('GAN_PRECISION', 'fp32')
+PRECISION_CALIBRATION_DIR = os.environ.get('PRECISION_CALIBRATION_DIR', '')
+PRECISION_MIN_AGREEMENT = float(os.environ.get('PRECISION_MIN_AGREEMENT', 0.98))
+PRECISION_MAX_PIXEL_ERROR = float(os.environ.get('PRECISION_MAX_PIXEL_ERROR', 0.02))
+
+# Fast-decision classification: processes created with fast_decision (default CLASSIFY_FAST_DECISION)
+# classify images in random order and pick the generator as soon as the majority class is settled at
+# CLASSIFY_EARLY_EXIT_CONFIDENCE, after at least CLASSIFY_EARLY_EXIT_MIN_SAMPLES images.
+# CLASSIFY_EARLY_EXIT_COMPLETE is 'background' (count the rest while generating) or 'skip'.
+CLASSIFY_FAST_DECISION = os.environ.get('CLASSIFY_FAST_DECISION', '0') == '1'
+CLASSIFY_EARLY_EXIT_CONFIDENCE = float(os.environ.get('CLASSIFY_EARLY_EXIT_CONFIDENCE', 0.999))
+CLASSIFY_EARLY_EXIT_MIN_SAMPLES = int(os.environ.get('CLASSIFY_EARLY_EXIT_MIN_SAMPLES', 64))
+CLASSIFY_EARLY_EXIT_COMPLETE = os.environ.get('CLASSIFY_EARLY_EXIT_COMPLETE', 'background')
+
+# Classifier image loading: decode JPEGs at reduced size close to 224px and build the normalized
+# tensor directly. Set to 0 to use the full-resolution PIL + torchvision transform path.
+CLASSIFIER_FAST_DECODE = os.environ.get('CLASSIFIER_FAST_DECODE', '1') == '1'
+
+# Chunked uploads (/api/uploads/): chunks of up to UPLOAD_CHUNK_MAX_BYTES are appended in order to a
+# file in UPLOAD_SESSION_DIR; sessions idle for UPLOAD_SESSION_MAX_AGE_SECONDS are discarded.
+UPLOAD_CHUNK_MAX_BYTES = int(os.environ.get('UPLOAD_CHUNK_MAX_BYTES', 16 * 1024 ** 2))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 4 * 1024 ** 3))
+UPLOAD_SESSION_DIR = os.environ.get('UPLOAD_SESSION_DIR', os.path.join(MEDIA_ROOT, 'upload_sessions'))
+UPLOAD_SESSION_MAX_AGE_SECONDS = int(os.environ.get('UPLOAD_SESSION_MAX_AGE_SECONDS', 24 * 3600))
+
+# Progress events (/api/processes/<id>/events/): how often each open stream re-reads its process.
+PROCESS_EVENTS_POLL_INTERVAL = float(os.environ.get('PROCESS_EVENTS_POLL_INTERVAL', 1.0))
+
+# Preview: a contact sheet of up to PREVIEW_MAX_IMAGES thumbnails (PREVIEW_THUMBNAIL_SIZE px) of the
+# first generated batch is saved under MEDIA_ROOT/previews as soon as that batch is done.
+PREVIEW_MAX_IMAGES = int(os.environ.get('PREVIEW_MAX_IMAGES', 16))
+PREVIEW_THUMBNAIL_SIZE = int(os.environ.get('PREVIEW_THUMBNAIL_SIZE', 96))
+
+# Lossless WebP output (output_format='webp'): encoder effort 0 (fastest) to 6 (smallest files).
+GAN_WEBP_METHOD = int(os.environ.get('GAN_WEBP_METHOD', 2))
+
+# Retention (manage.py enforce_retention, or every RETENTION_INTERVAL_SECONDS next to the job workers;
+# 0, the default, disables the timer): uploads, generated outputs, previews and leftover temporary files are deleted
+# once unused for their TTL (0 keeps them), then least recently used first while MEDIA_ROOT exceeds
+# RETENTION_MAX_MEDIA_BYTES (0 = no quota). Processes keep a record of what was deleted.
+RETENTION_UPLOAD_TTL_SECONDS = int(os.environ.get('RETENTION_UPLOAD_TTL_SECONDS', 7 * 24 * 3600))
+RETENTION_OUTPUT_TTL_SECONDS = int(os.environ.get('RETENTION_OUTPUT_TTL_SECONDS', 7 * 24 * 3600))
+RETENTION_PREVIEW_TTL_SECONDS = int(os.environ.get('RETENTION_PREVIEW_TTL_SECONDS', 7 * 24 * 3600))
+RETENTION_TEMP_TTL_SECONDS = int(os.environ.get('RETENTION_TEMP_TTL_SECONDS', 24 * 3600))
+RETENTION_MAX_MEDIA_BYTES = int(os.environ.get('RETENTION_MAX_MEDIA_BYTES', 0))
+RETENTION_INTERVAL_SECONDS = int(os.environ.get('RETENTION_INTERVAL_SECONDS', 0))
+
+# Process list (GET /api/processes/): page size when no ?limit= is given, and the largest allowed.
+PROCESS_LIST_PAGE_SIZE = int(os.environ.get('PROCESS_LIST_PAGE_SIZE', 50))
+PROCESS_LIST_MAX_PAGE_SIZE = int(os.environ.get('PROCESS_LIST_MAX_PAGE_SIZE', 200))
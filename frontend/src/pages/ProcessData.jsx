@@ -7,11 +7,14 @@ import Header from '../components/header';
 const ProcessData = () => {
   const [file, setFile] = useState(null);
   const [multiplier, setMultiplier] = useState(5);
+  const [outputFormat, setOutputFormat] = useState('zip');
   const [uploadProgress, setUploadProgress] = useState(0);
   const [processing, setProcessing] = useState(false);
   const [result, setResult] = useState(null);
   const [error, setError] = useState('');
   const [fileName, setFileName] = useState('');
+  const [preview, setPreview] = useState(null);
+  const [processId, setProcessId] = useState(null);
   const fileInputRef = useRef(null);
 
   const handleFileChange = (e) => {
@@ -36,7 +39,7 @@ const ProcessData = () => {
 
     const link = document.createElement('a');
     link.href = result.processed_file;
-    link.setAttribute('download', 'generated_images.zip');
+    link.setAttribute('download', result.processed_file.split('/').pop());
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
@@ -77,10 +80,12 @@ const ProcessData = () => {
     setUploadProgress(0);
     setError('');
     setResult(null);
+    setPreview(null);
 
     const formData = new FormData();
     formData.append('original_file', file);
     formData.append('multiplier', multiplier);
+    formData.append('output_format', outputFormat);
 
     try {
       // Step 1: Upload file
@@ -93,12 +98,21 @@ const ProcessData = () => {
       });
 
       const processId = uploadResponse.data.id;
+      setProcessId(processId);
 
-      // Step 2: Process data
+      // Step 2: Queue processing
       await axios.post(`http://localhost:8000/api/processes/${processId}/process_data/`);
 
-      // Step 3: Get results
-      const processResponse = await axios.get(`http://localhost:8000/api/processes/${processId}/`);
+      // Step 3: Poll until the job finishes
+      let processResponse = await axios.get(`http://localhost:8000/api/processes/${processId}/`);
+      while (!['done', 'failed'].includes(processResponse.data.state)) {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        processResponse = await axios.get(`http://localhost:8000/api/processes/${processId}/`);
+        if (processResponse.data.preview) setPreview(processResponse.data.preview);
+      }
+      if (processResponse.data.state === 'failed') {
+        throw { response: { data: { error: processResponse.data.error } } };
+      }
       setResult(processResponse.data);
 
     } catch (error) {
@@ -106,6 +120,16 @@ const ProcessData = () => {
       setError(error.response?.data?.error || 'An error occurred while processing your file. Please try again.');
     } finally {
       setProcessing(false);
+      setProcessId(null);
+    }
+  };
+
+  const handleCancel = async () => {
+    if (!processId) return;
+    try {
+      await axios.post(`http://localhost:8000/api/processes/${processId}/cancel/`);
+    } catch (error) {
+      console.error('Error cancelling process:', error);
     }
   };
 
@@ -197,6 +221,25 @@ const ProcessData = () => {
                   <p className="text-sm text-primary-500 mt-2">Number of times to multiply your image dataset</p>
                 </div>
 
+                {/* Output Format */}
+                <div>
+                  <label htmlFor="output_format" className="block text-sm font-medium text-primary-900 mb-2">
+                    Output Format
+                  </label>
+                  <select
+                    id="output_format"
+                    value={outputFormat}
+                    onChange={(e) => setOutputFormat(e.target.value)}
+                    className="w-full border border-primary-200 rounded-lg px-3 py-2 text-primary-900"
+                    disabled={processing}
+                  >
+                    <option value="zip">PNG images (ZIP)</option>
+                    <option value="tar">PNG images (uncompressed TAR)</option>
+                    <option value="webp">Lossless WebP images (ZIP)</option>
+                    <option value="npy">NumPy uint8 array (.npy)</option>
+                  </select>
+                </div>
+
                 {/* Submit Button */}
                 <button
                   type="submit"
@@ -236,6 +279,19 @@ const ProcessData = () => {
                     {uploadProgress >= 70 && uploadProgress < 90 && "Generating synthetic images..."}
                     {uploadProgress >= 90 && "Finalizing and creating download..."}
                   </p>
+                  {preview && (
+                    <div className="mt-4">
+                      <h4 className="text-primary-900 font-semibold mb-2">Preview of the first generated batch:</h4>
+                      <img src={preview} alt="Preview of generated images" className="rounded-lg border border-primary-200" />
+                      <button
+                        type="button"
+                        onClick={handleCancel}
+                        className="mt-3 bg-red-600 hover:bg-red-700 text-white rounded-lg px-4 py-2 font-medium transition-colors duration-200"
+                      >
+                        Cancel Run
+                      </button>
+                    </div>
+                  )}
                 </div>
               )}
 